@@ -0,0 +1,112 @@
+"""
+Local HTTP stand-in for the DeepL API, used by the offline benchmarks.
+
+Implements POST /v2/translate with tag_handling=xml (tags and attributes are kept,
+text content is "translated") and GET /v2/usage, which is all the SRT pipeline uses.
+"""
+import json
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def translate_xml(xml_string):
+    """
+    Mimics DeepL's XML tag handling: every element and attribute is preserved and
+    only text content changes (here it is upper-cased, which keeps lengths stable).
+    """
+    root = ET.fromstring(xml_string)
+    for elem in root.iter():
+        if elem.text:
+            elem.text = elem.text.upper()
+        if elem.tail:
+            elem.tail = elem.tail.upper()
+    return ET.tostring(root, encoding='unicode')
+
+
+class DeepLStandIn:
+    """
+    Runs the stand-in on a background thread.
+
+    Args:
+        latency (float): Seconds each translate request takes, to emulate the round trip.
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.requests = 0
+        self.characters = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/v2/usage"):
+                    with standin._lock:
+                        self._send_json({"character_count": standin.characters, "character_limit": 10 ** 12})
+                else:
+                    self._send_json({"message": "Not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length).decode('utf-8')
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(raw)
+                    texts = params.get("text", [])
+                    texts = texts if isinstance(texts, list) else [texts]
+                else:
+                    texts = parse_qs(raw).get("text", [])
+
+                if not self.path.startswith("/v2/translate"):
+                    self._send_json({"message": "Not found"}, status=404)
+                    return
+                if standin.latency:
+                    time.sleep(standin.latency)
+                with standin._lock:
+                    standin.requests += 1
+                    standin.characters += sum(len(text) for text in texts)
+                self._send_json({"translations": [
+                    {"detected_source_language": "EN", "text": translate_xml(text), "billed_characters": len(text)}
+                    for text in texts
+                ]})
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,249 @@
+"""
+Offline benchmark of the SRT translation pipeline.
+
+Generates synthetic SRT files, runs them through the pipeline against a local
+DeepL stand-in and records per-stage wall time, peak memory and throughput.
+Results are appended as JSON lines tagged with the git commit, so runs from
+different commits can be compared:
+
+    python -m server.benchmarks.pipeline_benchmark --cues 100 1000 10000 100000
+    python -m server.benchmarks.pipeline_benchmark --compare previous.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from deepl import Translator
+
+from ..translation_service import SRTTranslate
+from ..translation_service.TranslationMemory import TranslationMemory
+from ..translation_service.TranslatorBackend import DeepLBackend, AsyncDeepLBackend
+from .deepl_standin import DeepLStandIn
+
+DEFAULT_CUE_COUNTS = [100, 1000, 10000, 100000]
+# A stage counts as regressed when it is this much slower than the baseline,
+# ignoring differences below timer noise
+REGRESSION_THRESHOLD = 1.2
+REGRESSION_MIN_SECONDS = 0.005
+
+_WORDS = (
+    "the a we you they it this that was is are going to have been really just "
+    "know think right well so and but because time people way day thing world "
+    "Mr. Dr. etc. e.g. said told asked maybe never always here there now then"
+).split()
+_ENDINGS = ['.', '.', '.', '?', '!', '...', '', '', '', ',']
+
+
+def format_timestamp(ms):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def generate_srt(path, cue_count, seed=0):
+    """
+    Writes a synthetic SRT with cue_count cues. Roughly half of the cues end a
+    sentence, so sentences span one to several cues like real dialogue.
+    """
+    rng = random.Random(seed)
+    start = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(1, cue_count + 1):
+            duration = rng.randint(800, 4000)
+            words = rng.choices(_WORDS, k=rng.randint(2, 10))
+            text = ' '.join(words).capitalize() + rng.choice(_ENDINGS)
+            if rng.random() < 0.2:
+                # Two-line cue
+                middle = len(text) // 2
+                text = text[:middle].rstrip() + '\n' + text[middle:].lstrip()
+            f.write(f"{index}\n{format_timestamp(start)} --> {format_timestamp(start + duration)}\n{text}\n\n")
+            start += duration + rng.randint(0, 500)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(stages, name, fn, *args, **kwargs):
+    """Runs fn and records its wall time and the peak memory allocated while it ran."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    stage = {"seconds": elapsed}
+    if tracing:
+        _, peak = tracemalloc.get_traced_memory()
+        stage["peak_bytes"] = peak - baseline
+    stages[name] = stage
+    return result
+
+
+def run_stages(srt_path, target_lang, backend, memory_path):
+    """
+    Runs the pipeline stage by stage, in the same order as srt_translate_many.
+
+    Returns:
+        tuple: (stage measurements, cue count, sentence count)
+    """
+    stages = {}
+    translation_memory = TranslationMemory(path=memory_path)
+    subs = _measure(stages, "parse", SRTTranslate.validate_srt_file, srt_path)
+    sentences = _measure(stages, "segment", SRTTranslate.break_into_sentences, subs)
+    # The streaming path srt_translate_many uses: parse and segment in one pass
+    _measure(stages, "parse_segment",
+             lambda: SRTTranslate.break_into_sentences(SRTTranslate.iter_srt_cues(srt_path)))
+    elements = _measure(stages, "build_xml", SRTTranslate.build_subtitle_elements, sentences)
+    translated = _measure(
+        stages, "translate", SRTTranslate.translate_sentences, sentences, target_lang,
+        translation_memory=translation_memory, elements=elements, backend=backend
+    )
+    mapped = _measure(
+        stages, "map", SRTTranslate.map_sentences_back_split, sentences, translated, target_lang=target_lang
+    )
+
+    # split_text_into_chunks on its own, for every sentence spanning several cues
+    multi_cue = [(sentence.text, sentence.cue_count) for sentence in sentences if sentence.cue_count > 1]
+    _measure(stages, "split", lambda: [SRTTranslate.split_text_into_chunks(text, n) for text, n in multi_cue])
+
+    _measure(stages, "write", SRTTranslate.save_translated_subtitles, mapped, srt_path + ".out")
+    return stages, len(subs), len(sentences)
+
+
+def benchmark(cue_count, backend, workdir, target_lang="JA", trace_memory=True):
+    """
+    Benchmarks one file size: a timed pass without tracemalloc (tracing slows
+    Python down), an end-to-end srt_translate pass, and optionally a traced pass
+    for peak memory per stage.
+    """
+    srt_path = os.path.join(workdir, f"synthetic-{cue_count}.srt")
+    if not os.path.exists(srt_path):
+        generate_srt(srt_path, cue_count)
+
+    stages, cues, sentence_count = run_stages(
+        srt_path, target_lang, backend, os.path.join(workdir, f"tm-{cue_count}-timed.db")
+    )
+
+    started = time.perf_counter()
+    SRTTranslate.srt_translate(
+        srt_path, target_lang, backend=backend,
+        translation_memory=TranslationMemory(path=os.path.join(workdir, f"tm-{cue_count}-e2e.db"))
+    )
+    total = time.perf_counter() - started
+
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            traced, _, _ = run_stages(
+                srt_path, target_lang, backend, os.path.join(workdir, f"tm-{cue_count}-traced.db")
+            )
+        finally:
+            tracemalloc.stop()
+        for name, stage in traced.items():
+            stages[name]["peak_bytes"] = stage["peak_bytes"]
+
+    return {
+        "cues": cues,
+        "sentences": sentence_count,
+        "stages": stages,
+        "end_to_end_seconds": total,
+        "cues_per_second": cues / total if total else None,
+    }
+
+
+def compare(results, baseline_path):
+    """
+    Prints stages that got slower than REGRESSION_THRESHOLD times the most recent
+    baseline run for the same cue count.
+
+    Returns:
+        int: Number of regressed stages.
+    """
+    baseline = {}
+    with open(baseline_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                run = json.loads(line)
+                baseline[run["cues"]] = run
+
+    regressions = 0
+    for run in results:
+        previous = baseline.get(run["cues"])
+        if previous is None:
+            continue
+        for name, stage in run["stages"].items():
+            old = previous["stages"].get(name, {}).get("seconds")
+            if (old and stage["seconds"] > old * REGRESSION_THRESHOLD
+                    and stage["seconds"] - old > REGRESSION_MIN_SECONDS):
+                regressions += 1
+                print(f"REGRESSION {run['cues']} cues / {name}: {old:.4f}s -> {stage['seconds']:.4f}s "
+                      f"(baseline {previous.get('commit')})")
+    return regressions
+
+
+def print_table(run):
+    print(f"\n{run['cues']} cues, {run['sentences']} sentences, "
+          f"{run['end_to_end_seconds']:.3f}s end to end, {run['cues_per_second']:.0f} cues/s")
+    for name, stage in run["stages"].items():
+        peak = stage.get("peak_bytes")
+        peak_text = f"{peak / 1024 / 1024:9.2f} MiB" if peak is not None else ""
+        print(f"  {name:<14} {stage['seconds'] * 1000:10.2f} ms {peak_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SRT translation pipeline offline.")
+    parser.add_argument("--cues", type=int, nargs="+", default=DEFAULT_CUE_COUNTS,
+                        help="Cue counts of the synthetic files.")
+    parser.add_argument("--backend", choices=["deepl", "deepl-async"], default="deepl",
+                        help="Client used to talk to the local DeepL stand-in.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the stand-in waits per request.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass.")
+    parser.add_argument("--output", default="bench_results.jsonl", help="JSON lines file results are appended to.")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions.")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = []
+    with DeepLStandIn(latency=args.latency) as standin, tempfile.TemporaryDirectory() as workdir:
+        if args.backend == "deepl-async":
+            backend = AsyncDeepLBackend(auth_key="benchmark", server_url=standin.url)
+        else:
+            backend = DeepLBackend(Translator("benchmark", server_url=standin.url))
+
+        for cue_count in args.cues:
+            run = benchmark(cue_count, backend, workdir, trace_memory=not args.no_memory)
+            run.update({
+                "commit": commit,
+                "backend": args.backend,
+                "latency": args.latency,
+                "python": platform.python_version(),
+                "timestamp": datetime.utcnow().isoformat(),
+            })
+            results.append(run)
+            print_table(run)
+
+    with open(args.output, 'a', encoding='utf-8') as f:
+        for run in results:
+            f.write(json.dumps(run) + "\n")
+    print(f"\nResults appended to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
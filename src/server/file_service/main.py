@@ -1,27 +1,94 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, Header
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 from typing import Optional
 from uuid import uuid4
+from datetime import datetime
+import asyncio
+import base64
+import json
 import os
-import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future
 
-from ..translation_service.SRTTranslate import srt_translate
 from ..translation_service.TargetLanguage import TargetLanguage
-from .services.file_handler import validate_srt_file
-from .database import get_db, engine
-from .models.translation import TranslationJobResponse
-from .models.translation_job import TranslationJob, TranslationStatus, Base
+from ..translation_service.TranslationMemory import get_translation_memory
+from .services.file_handler import validate_srt_file, save_upload, validate_archive_file, extract_srt_archive
+from .services.downloads import download_response
+from .services.job_executor import JobExecutor
+from .services.job_queue import find_reusable_job
+from .services.metrics import metrics_registry, PROMETHEUS_CONTENT_TYPE
+from .services.job_events import job_event_bus, TERMINAL_STATUSES
+from .services.storage import StorageManager, touch_job
+from .database import get_db, init_db, SessionLocal
+from .settings import (
+    UPLOAD_DIR, TRANSLATION_EMBEDDED_WORKER, QUEUE_POLL_SECONDS, JOB_EVENTS_REFRESH_SECONDS,
+    JOB_EVENTS_MAX_WAIT_SECONDS, MAX_PAGE_SIZE
+)
+from .worker import process_translation, process_next_translation, default_worker_id
+from .models.translation import TranslationJobResponse, TranslationBatchResponse
+from .models.translation_job import TranslationJob, TranslationStatus
+from .models.translation_batch import TranslationBatch
 
 # SQL table create
-Base.metadata.create_all(bind=engine)
+init_db()
 
 app = FastAPI()
 
-UPLOAD_DIR = "/Users/yunseolee/Documents/GitHub/SRTTranslate/src/file_service/uploads/"
-TRANSLATED_DIR = "/Users/yunseolee/Documents/GitHub/SRTTranslate/src/file_service/translated/"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(TRANSLATED_DIR, exist_ok=True)
+# Translations run here instead of on the event loop
+job_executor = JobExecutor()
+_queue_poller_stop = threading.Event()
+# Set to make the poller look at the queue right away instead of after QUEUE_POLL_SECONDS
+_queue_poller_wake = threading.Event()
+# Serializes the reuse lookup and job insert so identical concurrent uploads coalesce
+_single_flight_lock = threading.Lock()
+# Expires and evicts stored files in the background; holds the reuse lock while deleting
+storage_manager = StorageManager(lock=_single_flight_lock)
+
+
+def poll_translation_queue():
+    """
+    Embedded worker: picks up retries and jobs left behind by a crashed process
+    whenever the executor has spare capacity.
+    """
+    worker_id = default_worker_id()
+    while not _queue_poller_stop.is_set():
+        _queue_poller_wake.wait(QUEUE_POLL_SECONDS)
+        _queue_poller_wake.clear()
+        if _queue_poller_stop.is_set():
+            break
+        while job_executor.reserve():
+            # The task claims once a pool thread runs it, so no lease waits unheartbeated
+            # in the executor queue. Waiting for its claim keeps the poller from queueing
+            # more tasks than there are due jobs.
+            claimed = Future()
+            job_executor.submit(process_next_translation, worker_id, claimed.set_result)
+            if not claimed.result():
+                break
+
+
+@app.on_event("startup")
+def start_queue_poller():
+    if TRANSLATION_EMBEDDED_WORKER:
+        threading.Thread(target=poll_translation_queue, name="translation-queue-poller", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_storage_cleanup():
+    storage_manager.start()
+
+
+@app.on_event("shutdown")
+def shutdown_job_executor():
+    storage_manager.stop()
+    _queue_poller_stop.set()
+    _queue_poller_wake.set()
+    job_executor.shutdown(wait=True)
 
 # Dependency: Decode the Authorization header to get user info (if logged in)
 def get_current_user(authorization: Optional[str] = Header(None)):
@@ -65,55 +132,311 @@ def read_files(db: Session = Depends(get_db), session_id: str = Depends(get_sess
     """
     List only the files that belong to the current session (persistent if logged in, temporary if anonymous).
     """
-    # Query the database for translation jobs owned by this session.
-    jobs = db.query(TranslationJob).filter(TranslationJob.owner_id == session_id).all()
-    files = [job.original_filename for job in jobs]
+    # Only the filename column is read, straight from the (owner_id, created_at, id) index order
+    rows = (db.query(TranslationJob.original_filename)
+            .filter(TranslationJob.owner_id == session_id)
+            .order_by(TranslationJob.created_at, TranslationJob.id))
+    files = [row.original_filename for row in rows]
     return {"files": files}
 
 
+def _add_translation_jobs(db: Session, filename, file_path, content_hash, target_lang, session_id, batch_id=None):
+    """
+    Adds a translation job per target language to the session, without committing.
+    Content already translated is served from the earlier output, content being
+    translated right now is coalesced onto that job; only the rest is queued.
+    Call under _single_flight_lock.
+
+    Returns:
+        tuple: (all new jobs, the jobs that need translating)
+    """
+    jobs = []
+    queued = []
+    for lang in target_lang:
+        job = TranslationJob(
+            original_filename=filename,
+            original_file_path=file_path,
+            content_hash=content_hash,
+            target_language=lang.value,
+            status=TranslationStatus.PENDING,
+            owner_id = session_id,
+            batch_id=batch_id
+        )
+        reusable = find_reusable_job(db, content_hash, lang.value)
+        if reusable is None:
+            queued.append(job)
+        elif reusable.status == TranslationStatus.COMPLETED:
+            job.status = TranslationStatus.COMPLETED
+            job.translated_file_path = reusable.translated_file_path
+            job.translated_file_size = reusable.translated_file_size
+        else:
+            job.source_job_id = reusable.id
+        db.add(job)
+        jobs.append(job)
+    return jobs, queued
+
+
+def _create_translation_jobs(db: Session, filename, file_path, content_hash, target_lang, session_id):
+    """Commits the jobs of an upload under _single_flight_lock. Blocks, so run it off the event loop."""
+    with _single_flight_lock:
+        jobs, queued = _add_translation_jobs(db, filename, file_path, content_hash, target_lang, session_id)
+        db.commit()
+    for job in jobs:
+        db.refresh(job)
+    return jobs, queued
+
+
+def _create_batch(db: Session, filename, extracted, target_lang, session_id):
+    """Commits a batch and the jobs of its files under _single_flight_lock. Blocks, so run it off the event loop."""
+    with _single_flight_lock:
+        batch = TranslationBatch(
+            original_filename=filename,
+            owner_id=session_id,
+            target_languages=[lang.value for lang in target_lang],
+            file_count=len(extracted)
+        )
+        db.add(batch)
+        db.flush()
+        for name, file_path, content_hash, _ in extracted:
+            _add_translation_jobs(db, name, file_path, content_hash, target_lang, session_id, batch.id)
+            # Later files of the archive with the same content coalesce onto these jobs
+            db.flush()
+        db.commit()
+    db.refresh(batch)
+    return _batch_response(db, batch)
+
+
 # File upload endpoint
 @app.post("/uploadfile/", response_model=TranslationJobResponse)
 async def upload_file(
     file: UploadFile,
     target_lang: list[TargetLanguage],
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     session_id: str = Depends(get_session_id)
 ):
+    # Backpressure: refuse new work instead of queueing it without bound
+    if TRANSLATION_EMBEDDED_WORKER and not job_executor.reserve():
+        raise HTTPException(
+            status_code=503,
+            detail="Translation queue is full, please retry later",
+            headers={"Retry-After": "30"}
+        )
     try:
         _ = validate_srt_file(file)
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        # Create translation jobs for each target language
-        jobs = []
-        for lang in target_lang:
-            job = TranslationJob(
-                original_filename=file.filename,
-                target_language=lang.value,
-                status=TranslationStatus.PENDING,
-                owner_id = session_id
-            )
-            db.add(job)
-            db.commit()
-            db.refresh(job)
-            jobs.append(job)
-
-            # Add translation task to background tasks
-            background_tasks.add_task(
-                process_translation,
-                file_path,
-                lang,
-                job.id,
-                db
-            )
+        # Validate, hash and write in one chunked pass, off the event loop
+        file_path, content_hash, _ = await run_in_threadpool(save_upload, file, UPLOAD_DIR)
+
+        jobs, queued = await run_in_threadpool(
+            _create_translation_jobs, db, file.filename, file_path, content_hash, target_lang, session_id
+        )
+
+        # The rows are the durable queue; the embedded worker starts on them right away,
+        # otherwise a dedicated worker process claims them.
+        if TRANSLATION_EMBEDDED_WORKER:
+            if queued:
+                job_executor.submit(process_translation, [job.id for job in queued])
+            else:
+                job_executor.release()
 
         return jobs[0]  # Return the first job for simplicity
+    except HTTPException:
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.release()
+        raise
+    except Exception as e:
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.release()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/batches/", response_model=TranslationBatchResponse)
+async def upload_batch(
+    file: UploadFile,
+    target_lang: list[TargetLanguage],
+    db: Session = Depends(get_db),
+    session_id: str = Depends(get_session_id)
+):
+    """
+    Translates every .srt file of a zip or tar archive (e.g. a whole season) into
+    the given languages. All jobs are created in one transaction; workers then
+    claim the batch's small files together so they share DeepL requests.
+    """
+    if TRANSLATION_EMBEDDED_WORKER and not job_executor.reserve():
+        raise HTTPException(
+            status_code=503,
+            detail="Translation queue is full, please retry later",
+            headers={"Retry-After": "30"}
+        )
+    try:
+        _ = validate_archive_file(file)
+        extracted = await run_in_threadpool(extract_srt_archive, file, UPLOAD_DIR)
+
+        return await run_in_threadpool(_create_batch, db, file.filename, extracted, target_lang, session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # The slot only guarded the upload; the poller claims the batch in packs as slots free up
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.release()
+            _queue_poller_wake.set()
+
+
+def _commit_and_refresh(db: Session, job):
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+
+def _batch_response(db: Session, batch: TranslationBatch):
+    jobs = dict(
+        db.query(TranslationJob.status, func.count(TranslationJob.id))
+        .filter(TranslationJob.batch_id == batch.id)
+        .group_by(TranslationJob.status)
+        .all()
+    )
+    total = sum(jobs.values())
+    finished = jobs.get(TranslationStatus.COMPLETED, 0) + jobs.get(TranslationStatus.FAILED, 0)
+    # Running jobs contribute the progress their worker last published
+    running = (db.query(TranslationJob.id)
+               .filter(TranslationJob.batch_id == batch.id, TranslationJob.status == TranslationStatus.PROCESSING))
+    running_progress = sum((job_event_bus.latest(job.id) or {}).get("progress", 0) for job in running)
+    return TranslationBatchResponse(
+        id=batch.id,
+        original_filename=batch.original_filename,
+        target_languages=batch.target_languages,
+        file_count=batch.file_count,
+        created_at=batch.created_at,
+        jobs={status.value: count for status, count in jobs.items()},
+        progress=(finished * 100 + running_progress) // total if total else 100
+    )
+
+
+def _owned_batch(db: Session, batch_id: int, session_id: str):
+    batch = db.query(TranslationBatch).filter(TranslationBatch.id == batch_id, TranslationBatch.owner_id == session_id).first()
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Translation batch not found")
+    return batch
+
+
+@app.get("/batches/{batch_id}", response_model=TranslationBatchResponse)
+def get_batch_status(batch_id: int, db: Session = Depends(get_db), session_id: str = Depends(get_session_id)):
+    return _batch_response(db, _owned_batch(db, batch_id, session_id))
+
+
+@app.get("/batches/{batch_id}/download")
+def download_batch(batch_id: int, db: Session = Depends(get_db), session_id: str = Depends(get_session_id)):
+    """
+    Downloads every completed translation of a batch as one zip, laid out like the
+    uploaded archive. Failed jobs are left out.
+    """
+    batch = _owned_batch(db, batch_id, session_id)
+    jobs = db.query(TranslationJob).filter(TranslationJob.batch_id == batch.id).order_by(TranslationJob.id).all()
+    if any(job.status in (TranslationStatus.PENDING, TranslationStatus.PROCESSING) for job in jobs):
+        raise HTTPException(status_code=400, detail="Translation not completed yet")
+
+    fd, zip_path = tempfile.mkstemp(suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as out, zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for job in jobs:
+                if (job.status == TranslationStatus.COMPLETED and job.translated_file_path
+                        and os.path.exists(job.translated_file_path)):
+                    archive.write(job.translated_file_path, f"{job.original_filename}-{job.target_language}.srt")
+                    touch_job(job)
+    except BaseException:
+        os.remove(zip_path)
+        raise
+    db.commit()
+
+    archive_name = batch.original_filename.split('.')[0] or f"batch-{batch.id}"
+    return FileResponse(
+        zip_path,
+        filename=f"{archive_name}-translated.zip",
+        media_type="application/zip",
+        background=BackgroundTask(os.remove, zip_path)
+    )
+
+
+@app.post("/translation/{job_id}/revision", response_model=TranslationJobResponse)
+async def upload_revision(
+    job_id: int,
+    file: UploadFile,
+    db: Session = Depends(get_db),
+    session_id: str = Depends(get_session_id)
+):
+    """
+    Translates an edited version of a completed job's file into the same language.
+    Only the sentences that changed are sent to DeepL; the rest of the previous
+    translation is kept.
+    """
+    previous = db.query(TranslationJob).filter(TranslationJob.id == job_id, TranslationJob.owner_id == session_id).first()
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Translation job not found")
+    if previous.status != TranslationStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Translation not completed yet")
+
+    if TRANSLATION_EMBEDDED_WORKER and not job_executor.reserve():
+        raise HTTPException(
+            status_code=503,
+            detail="Translation queue is full, please retry later",
+            headers={"Retry-After": "30"}
+        )
+    try:
+        _ = validate_srt_file(file)
+        file_path, content_hash, _ = await run_in_threadpool(save_upload, file, UPLOAD_DIR)
+
+        job = TranslationJob(
+            original_filename=file.filename,
+            original_file_path=file_path,
+            content_hash=content_hash,
+            target_language=previous.target_language,
+            status=TranslationStatus.PENDING,
+            owner_id=session_id,
+            previous_job_id=previous.id
+        )
+        await run_in_threadpool(_commit_and_refresh, db, job)
+
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.submit(process_translation, [job.id])
+        return job
+    except HTTPException:
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.release()
+        raise
     except Exception as e:
+        if TRANSLATION_EMBEDDED_WORKER:
+            job_executor.release()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/translation/{job_id}/resume", response_model=TranslationJobResponse)
+def resume_translation(job_id: int, db: Session = Depends(get_db), session_id: str = Depends(get_session_id)):
+    """
+    Puts a failed job back in the queue. Batches DeepL already translated for it
+    are kept, so only the remaining sentences are sent again.
+    """
+    job = db.query(TranslationJob).filter(TranslationJob.id == job_id, TranslationJob.owner_id == session_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Translation job not found")
+    if job.status != TranslationStatus.FAILED or job.source_job_id is not None:
+        raise HTTPException(status_code=400, detail="Only failed translations can be resumed")
+    if job.files_evicted_at is not None:
+        raise HTTPException(status_code=410, detail="Translation expired and its files were removed")
+
+    job.status = TranslationStatus.PENDING
+    job.attempts = 0
+    job.next_attempt_at = datetime.utcnow()
+    job.error_message = None
+    db.commit()
+    db.refresh(job)
+
+    if TRANSLATION_EMBEDDED_WORKER and job_executor.reserve():
+        job_executor.submit(process_translation, [job.id])
+    # Otherwise the queue poller or a standalone worker picks it up
+    return job
+
+
 @app.get("/translation/{job_id}", response_model=TranslationJobResponse)
 async def get_translation_status(job_id: int, db: Session = Depends(get_db), session_id: str = Depends(get_session_id)):
     job = db.query(TranslationJob).filter(TranslationJob.id == job_id, TranslationJob.owner_id == session_id).first()
@@ -122,69 +445,207 @@ async def get_translation_status(job_id: int, db: Session = Depends(get_db), ses
     return job.status
     
 
+def _refresh_job_event(job_id: int):
+    """
+    Re-reads a job's status from the database and publishes it if the event bus
+    has not seen it, e.g. because a worker in another process changed it.
+
+    Returns:
+        dict: The job's latest event, or None if the job does not exist.
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(TranslationJob.status, TranslationJob.error_message).filter(TranslationJob.id == job_id).first()
+    finally:
+        db.close()
+    if job is None:
+        return None
+    latest = job_event_bus.latest(job_id)
+    if latest is not None and latest["status"] == job.status.value:
+        return latest
+    return job_event_bus.publish(job_id, job.status, error_message=job.error_message)
+
+
+def _watched_job_id(db: Session, job_id: int, session_id: str):
+    """Returns the job whose events describe job_id: its source job if it was coalesced."""
+    job = (db.query(TranslationJob.id, TranslationJob.source_job_id)
+           .filter(TranslationJob.id == job_id, TranslationJob.owner_id == session_id)
+           .first())
+    if job is None:
+        raise HTTPException(status_code=404, detail="Translation job not found")
+    return job.source_job_id or job.id
+
+
+def _as_job_event(event, job_id: int):
+    # Events of a source job are reported under the id the client asked about
+    return {**event, "job_id": job_id}
+
+
+@app.get("/translation/{job_id}/events")
+async def stream_translation_status(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    session_id: str = Depends(get_session_id)
+):
+    """
+    Server-Sent Events stream of a job's status and progress. Every state change
+    is pushed as a 'status' event; the stream ends once the job completes or fails.
+    """
+    watched_id = await run_in_threadpool(_watched_job_id, db, job_id, session_id)
+
+    async def events():
+        queue = job_event_bus.subscribe(watched_id)
+        try:
+            event = job_event_bus.latest(watched_id) or await run_in_threadpool(_refresh_job_event, watched_id)
+            while event is not None:
+                yield f"id: {event['version']}\nevent: status\ndata: {json.dumps(_as_job_event(event, job_id))}\n\n"
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+                sent_version = event["version"]
+                event = None
+                while event is None or event["version"] <= sent_version:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), JOB_EVENTS_REFRESH_SECONDS)
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            return
+                        event = await run_in_threadpool(_refresh_job_event, watched_id)
+                        if event is None or event["version"] <= sent_version:
+                            yield ": keepalive\n\n"
+                            if event is None:
+                                return
+        finally:
+            job_event_bus.unsubscribe(watched_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/translation/{job_id}/wait")
+async def wait_translation_status(
+    job_id: int,
+    since: int = 0,
+    timeout: float = 30,
+    db: Session = Depends(get_db),
+    session_id: str = Depends(get_session_id)
+):
+    """
+    Long-poll fallback of the event stream: returns as soon as the job has an event
+    newer than version 'since', or its current state after timeout seconds.
+    """
+    watched_id = await run_in_threadpool(_watched_job_id, db, job_id, session_id)
+    timeout = max(0.0, min(timeout, JOB_EVENTS_MAX_WAIT_SECONDS))
+    if job_event_bus.latest(watched_id) is None:
+        await run_in_threadpool(_refresh_job_event, watched_id)
+    event = await job_event_bus.wait(watched_id, since, timeout)
+    if event is None:
+        event = await run_in_threadpool(_refresh_job_event, watched_id)
+    return _as_job_event(event, job_id)
+
+
 @app.get("/translations/", response_model=list[TranslationJobResponse])
-async def list_translations(
-    skip: int = 0,
-    limit: int = 10,
+def list_translations(
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[list[TranslationStatus]] = Query(None),
+    skip: int = Query(0, ge=0, deprecated=True),
     db: Session = Depends(get_db),
     session_id: str = Depends(get_session_id)
 ):
-    jobs = db.query(TranslationJob).filter(TranslationJob.owner_id == session_id).offset(skip).limit(limit).all()
-    return jobs
+    """
+    Lists the session's jobs, newest first, optionally only those in the given statuses.
+
+    Pages are keyset-paginated: when more jobs follow, the X-Next-Cursor response
+    header holds the cursor to pass for the next page, which costs the same however
+    deep it is. skip still pages by offset for older clients.
+    """
+    columns = [getattr(TranslationJob, name) for name in TranslationJobResponse.model_fields]
+    query = db.query(*columns).filter(TranslationJob.owner_id == session_id)
+    if status:
+        query = query.filter(TranslationJob.status.in_(status))
+    query = query.order_by(TranslationJob.created_at.desc(), TranslationJob.id.desc())
+    if cursor is not None:
+        created_at, job_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(TranslationJob.created_at, TranslationJob.id) < tuple_(created_at, job_id))
+    elif skip:
+        query = query.offset(skip)
+    # One row more than the page tells whether there is a next one
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [row._asdict() for row in rows]
+
+
+def _encode_cursor(created_at, job_id):
+    """Opaque cursor pointing just past a job in list_translations order."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{job_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.fromisoformat(created_at), int(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint: job outcomes, per-stage time and request counters
+    of the jobs this process ran, and the DeepL request scheduler's retries,
+    rate limits and concurrency. Per-job values are also stored on each TranslationJob.
+    """
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/translation-memory/stats")
+def translation_memory_stats():
+    """
+    Hit rate of the translation memory and the DeepL characters it saved.
+    """
+    return get_translation_memory().stats()
 
 
 @app.get("/download/{job_id}")
-async def download_translation(job_id: int, db: Session = Depends(get_db)):
+def download_translation(
+    job_id: int,
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Downloads a completed translation. Responses carry a strong ETag (the sha256 of
+    the file) and Cache-Control, answer If-None-Match with 304 and support Range;
+    clients that accept it get the stored brotli or gzip variant.
+    """
     job = db.query(TranslationJob).filter(TranslationJob.id == job_id).first()
     if job is None:
         raise HTTPException(status_code=404, detail="Translation job not found")
     
     if job.status != TranslationStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Translation not completed yet")
-    
-    if not os.path.exists(job.translated_file_path):
-        raise HTTPException(status_code=404, detail="Translated file not found")
-    
-    return FileResponse(
-        job.translated_file_path,
-        filename=os.path.basename(job.translated_file_path),
-        media_type="application/x-subrip"
-    )
-
 
-async def process_translation(
-    file_path: str,
-    target_lang: TargetLanguage,
-    job_id: int,
-    db: Session
-):
-    """Background task to process translation and update job status"""
-    try:
-        # Update status to processing
-        job = db.query(TranslationJob).filter(TranslationJob.id == job_id).first()
-        job.status = TranslationStatus.PROCESSING
-        db.commit()
+    if job.files_evicted_at is not None:
+        raise HTTPException(status_code=410, detail="Translation expired and its files were removed")
 
-        # Perform translation
-        translated_subs = srt_translate(file_path, target_lang)
+    if not job.translated_file_path or not os.path.exists(job.translated_file_path):
+        raise HTTPException(status_code=404, detail="Translated file not found")
 
-        # Save translated subtitles as a new file
-        translated_filename = f"{job.original_filename}-{target_lang.value}.srt"
-        translated_file_path = os.path.join(TRANSLATED_DIR, translated_filename)
-        translated_subs.save(translated_file_path)
+    touch_job(job)
+    db.commit()
+    # Stored outputs are named by content hash; give the client a readable name
+    return download_response(
+        job.translated_file_path,
+        filename=f"{job.original_filename}-{job.target_language}.srt",
+        media_type="application/x-subrip",
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding
+    )
 
-        # Update status to completed
-        job.status = TranslationStatus.COMPLETED
-        job.translated_file_path = translated_file_path
-        db.commit()
-    except Exception as e:
-        # Update status to failed with error message
-        job.status = TranslationStatus.FAILED
-        job.error_message = str(e)
-        db.commit()
 
 # TODO: Use unique filenames to prevent collisions
-# Implement file cleanup for old translations
 # Move to cloud storage (AWS S3, Google Cloud Storage, etc.)
-# Add file expiration dates
 # Implement user-specific file access controls
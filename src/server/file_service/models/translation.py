@@ -16,6 +16,18 @@ class TranslationJobResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     error_message: Optional[str] = None
+    metrics: Optional[dict] = None
 
     class Config:
         from_attributes = True
+
+class TranslationBatchResponse(BaseModel):
+    id: int
+    original_filename: str
+    target_languages: list[str]
+    file_count: int
+    created_at: datetime
+    # Jobs per status, e.g. {"completed": 10, "processing": 2}
+    jobs: dict[str, int]
+    # Share of the batch's jobs that finished, with live progress of the running ones
+    progress: int
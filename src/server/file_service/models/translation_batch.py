@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from datetime import datetime
+
+from ..database import Base
+
+
+class TranslationBatch(Base):
+    """An archive of SRT files uploaded together; its jobs point to it through TranslationJob.batch_id."""
+    __tablename__ = "translation_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    original_filename = Column(String)
+    owner_id = Column(String, index=True)
+    target_languages = Column(JSON)
+    file_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, DateTime, Text
+from datetime import datetime
+
+from ..database import Base
+
+
+class TranslationChunk(Base):
+    """
+    One translated DeepL batch of a job, saved as soon as it arrives so a retried
+    or resumed job only sends the sentences it is still missing.
+    """
+    __tablename__ = "translation_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, index=True)
+    # Range of subtitle ids (first cue of each sentence) the batch covers
+    first_subtitle_id = Column(Integer)
+    last_subtitle_id = Column(Integer)
+    # The translated <subtitles> document returned by DeepL
+    translated_xml = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,9 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, Enum as SQLEnum
 from datetime import datetime
 from enum import Enum
 
-Base = declarative_base()
+from ..database import Base
 
 class TranslationStatus(str, Enum):
     PENDING = "pending"
@@ -13,14 +12,44 @@ class TranslationStatus(str, Enum):
 
 class TranslationJob(Base):
     __tablename__ = "translation_jobs"
+    __table_args__ = (
+        # Listing a session's jobs newest first, see list_translations
+        Index("ix_translation_jobs_owner_created", "owner_id", "created_at", "id"),
+        # Scans of jobs by state, e.g. the queue and operational queries
+        Index("ix_translation_jobs_status_created", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     original_filename = Column(String)
-    original_file_path = Column(String)
-    translated_file_path = Column(String, nullable=True)
+    original_file_path = Column(String, index=True)
+    translated_file_path = Column(String, nullable=True, index=True)
     target_language = Column(String)
     owner_id = Column(String)
+    # sha256 of the uploaded file; uploads are stored under this name
+    content_hash = Column(String, nullable=True, index=True)
+    # Set when this job was coalesced onto an identical in-flight job and mirrors its outcome
+    source_job_id = Column(Integer, nullable=True, index=True)
+    # Set for revised uploads, which are translated incrementally against this job
+    previous_job_id = Column(Integer, nullable=True)
+    # Set for files uploaded in an archive, see models/translation_batch.py
+    batch_id = Column(Integer, nullable=True, index=True)
     status = Column(SQLEnum(TranslationStatus))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     error_message = Column(String, nullable=True)
+    # Stage timings and counters of the last attempt, see translation_service/JobMetrics.py
+    metrics = Column(JSON, nullable=True)
+
+    # Storage lifecycle, see services/storage.py
+    original_file_size = Column(Integer, nullable=True)
+    translated_file_size = Column(Integer, nullable=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow)
+    # Set once the files were given up to expiry or a quota; both paths are cleared then
+    files_evicted_at = Column(DateTime, nullable=True)
+
+    # Durable queue bookkeeping, see services/job_queue.py
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
@@ -0,0 +1,49 @@
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.translation_chunk import TranslationChunk
+
+
+class JobCheckpoint:
+    """
+    Durable progress of one translation job, in the shape translate_sentences expects.
+
+    Batches are saved from DeepL worker threads while the job's own session is in
+    use, so every call opens a short-lived session and commits immediately: a
+    batch that came back is never lost, whatever happens to the rest of the job.
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def load(self):
+        """Returns the translated XML documents saved by earlier attempts, oldest first."""
+        db = SessionLocal()
+        try:
+            return [row.translated_xml for row in (db.query(TranslationChunk.translated_xml)
+                                                   .filter(TranslationChunk.job_id == self.job_id)
+                                                   .order_by(TranslationChunk.id))]
+        finally:
+            db.close()
+
+    def save(self, first_subtitle_id: int, last_subtitle_id: int, translated_xml: str):
+        db = SessionLocal()
+        try:
+            db.add(TranslationChunk(
+                job_id=self.job_id,
+                first_subtitle_id=first_subtitle_id,
+                last_subtitle_id=last_subtitle_id,
+                translated_xml=translated_xml
+            ))
+            db.commit()
+        except Exception as e:
+            # A lost checkpoint only costs a re-translation on retry, never the job itself
+            db.rollback()
+            print(f"Failed to checkpoint job {self.job_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+def clear_checkpoint(db: Session, job_id: int):
+    """Drops a job's saved batches once its output is written. The caller commits."""
+    db.query(TranslationChunk).filter(TranslationChunk.job_id == job_id).delete(synchronize_session=False)
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are stored
+    brotli = None
+
+# Outputs smaller than this are not worth a compressed variant
+DOWNLOAD_COMPRESS_MIN_BYTES = int(os.environ.get("DOWNLOAD_COMPRESS_MIN_BYTES", 1024))
+# A completed translation never changes; clients and the CDN revalidate with the ETag once it expires
+DOWNLOAD_CACHE_CONTROL = os.environ.get("DOWNLOAD_CACHE_CONTROL", "public, max-age=86400")
+
+# Content-Encoding -> suffix of the stored variant, in order of preference
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+HASH_SUFFIX = ".sha256"
+
+
+def variant_paths(path):
+    """Every file stored alongside a translated output: its compressed variants and its hash."""
+    return [path + suffix for _, suffix in ENCODING_SUFFIXES] + [path + HASH_SUFFIX]
+
+
+def store_download_variants(path):
+    """
+    Precomputes what downloads of a translated file need: its sha256, used as
+    the ETag, and gzip (and, when the brotli package is installed, brotli)
+    variants, so downloads are never compressed per request. Call after every
+    write of the file; each sidecar file is replaced atomically.
+
+    Returns:
+        str: The sha256 hex digest of the file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    variants = {}
+    if len(data) >= DOWNLOAD_COMPRESS_MIN_BYTES:
+        # mtime=0 keeps the gzip bytes, and so their ETag, a function of the content
+        variants[".gz"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, mode=brotli.MODE_TEXT)
+    variants[HASH_SUFFIX] = content_hash.encode()
+
+    for _, suffix in ENCODING_SUFFIXES:
+        if suffix not in variants and os.path.exists(path + suffix):
+            # Left over from an earlier, larger version of the file
+            os.remove(path + suffix)
+    for suffix, content in variants.items():
+        # Unique temporary names, as several jobs may store variants of the same output at once
+        fd, part_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                         prefix=os.path.basename(path + suffix) + ".", suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(part_path, path + suffix)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+    return content_hash
+
+
+def download_response(path, filename, media_type, if_none_match=None, accept_encoding=None):
+    """
+    Builds the response for a GET of a translated file.
+
+    The representation is the best stored variant the client accepts. Its ETag is
+    the sha256 of the file (suffixed with the encoding for compressed variants),
+    so a matching If-None-Match gets 304 Not Modified; Range and If-Range
+    requests are answered by FileResponse against the same ETag.
+
+    Args:
+        path (str): The translated file.
+        filename (str): Name offered to the client in Content-Disposition.
+        media_type (str): Content-Type of the file.
+        if_none_match (str optional): The request's If-None-Match header.
+        accept_encoding (str optional): The request's Accept-Encoding header.
+    """
+    try:
+        with open(path + HASH_SUFFIX, encoding='ascii') as f:
+            content_hash = f.read().strip()
+    except FileNotFoundError:
+        # Written before variants were stored
+        content_hash = store_download_variants(path)
+
+    encoding = _select_encoding(path, accept_encoding)
+    etag = f'"{content_hash}-{encoding}"' if encoding else f'"{content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": DOWNLOAD_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        return FileResponse(path, filename=filename, media_type=media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    return FileResponse(path + dict(ENCODING_SUFFIXES)[encoding], filename=filename, media_type=media_type,
+                        headers=headers)
+
+
+def _select_encoding(path, accept_encoding):
+    """Returns the preferred stored Content-Encoding the client accepts, or None for the file itself."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0 and os.path.exists(path + suffix):
+            return encoding
+    return None
+
+
+def _etag_matches(if_none_match, etag):
+    # If-None-Match uses weak comparison: W/ prefixes are ignored
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
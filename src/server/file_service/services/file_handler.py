@@ -1,19 +1,149 @@
+import hashlib
+import os
+import posixpath
+import tarfile
+import tempfile
+import zipfile
+
 from fastapi import HTTPException, UploadFile
 
+from .storage import sharded_path
+
+# Uploads are streamed to disk in chunks, so the cap only bounds disk usage, not memory
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_ARCHIVE_BYTES = int(os.environ.get("MAX_ARCHIVE_BYTES", 1024 * 1024 * 1024))
+MAX_ARCHIVE_FILES = int(os.environ.get("MAX_ARCHIVE_FILES", 500))
+# Bounds what a highly compressed archive (zip bomb) can write to disk
+MAX_ARCHIVE_EXTRACTED_BYTES = int(os.environ.get("MAX_ARCHIVE_EXTRACTED_BYTES", 2 * 1024 * 1024 * 1024))
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
 def validate_srt_file(file: UploadFile):
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Filename is required")
     if not file.filename.endswith('.srt'):
         raise HTTPException(status_code=400, detail="Only .srt files are allowed")
-    if file.size > 10 * 1024 * 1024:  # 10MB limit
-        raise HTTPException(status_code=400, detail="File size too large. Maximum size is 10MB")
-    
+    # The declared size is checked up front; save_upload enforces the limit on the actual bytes
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=_too_large_detail())
+    return file
+
+
+def save_upload(file: UploadFile, upload_dir: str):
+    """
+    Writes an upload into upload_dir in one pass over fixed-size chunks, hashing it
+    and enforcing MAX_UPLOAD_BYTES on the way. Uploads are content-addressed:
+    the file is stored as <sha256>.srt (in a hashed subdirectory), so identical
+    uploads share one file and different users can never overwrite each other.
+
+    Returns:
+        tuple: (stored file path, sha256 hex digest, size in bytes)
+    """
+    return save_stream(file.file, upload_dir)
+
+
+def save_stream(source, upload_dir: str):
+    """Same as save_upload for any binary file object, e.g. an archive member."""
+    fd, part_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+                hasher.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        content_hash = hasher.hexdigest()
+        file_path = sharded_path(upload_dir, f"{content_hash}.srt")
+        # Same content is already stored (or being stored) under the same name
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path, content_hash, size
+
+
+def validate_archive_file(file: UploadFile):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename is required")
-
-    # Check if file is empty
-    file_content = file.file.read()
-    if len(file_content) == 0:
-        raise HTTPException(status_code=400, detail="File is empty")
-    
-    # Reset file pointer after reading
-    file.file.seek(0)
+    if not file.filename.lower().endswith(ARCHIVE_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only .zip and .tar archives are allowed")
+    if file.size is not None and file.size > MAX_ARCHIVE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Archive too large. Maximum size is {MAX_ARCHIVE_BYTES // (1024 * 1024)}MB"
+        )
     return file
+
+
+def extract_srt_archive(file: UploadFile, upload_dir: str):
+    """
+    Stores every .srt file of a zip or tar upload like save_upload does, one member
+    at a time. Tar archives (compressed or not) are read as a stream; zip archives
+    need their central directory, which the spooled upload file allows seeking to.
+    Other files, empty files, directories and macOS metadata entries are skipped.
+
+    Returns:
+        list: (name inside the archive, stored file path, sha256 hex digest, size) per SRT file.
+    """
+    extracted = []
+    extracted_bytes = 0
+
+    def store(name, source):
+        nonlocal extracted_bytes
+        if len(extracted) >= MAX_ARCHIVE_FILES:
+            raise HTTPException(status_code=413, detail=f"Archive holds more than {MAX_ARCHIVE_FILES} SRT files")
+        try:
+            file_path, content_hash, size = save_stream(source, upload_dir)
+        except HTTPException as e:
+            if e.status_code == 400:
+                return
+            raise HTTPException(status_code=e.status_code, detail=f"{name}: {e.detail}")
+        extracted_bytes += size
+        if extracted_bytes > MAX_ARCHIVE_EXTRACTED_BYTES:
+            raise HTTPException(status_code=413, detail="Archive expands to too much data")
+        extracted.append((name, file_path, content_hash, size))
+
+    try:
+        if file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.file) as archive:
+                for info in archive.infolist():
+                    name = _archive_member_name(info.filename)
+                    if not info.is_dir() and name is not None:
+                        with archive.open(info) as source:
+                            store(name, source)
+        else:
+            with tarfile.open(fileobj=file.file, mode='r|*') as archive:
+                for member in archive:
+                    name = _archive_member_name(member.name)
+                    if member.isfile() and name is not None:
+                        store(name, archive.extractfile(member))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+
+    if not extracted:
+        raise HTTPException(status_code=400, detail="Archive contains no .srt files")
+    return extracted
+
+
+def _archive_member_name(name):
+    """Returns the relative path of an SRT archive member, or None if it should be skipped."""
+    parts = [part for part in posixpath.normpath(name.replace('\\', '/')).split('/') if part not in ('', '.', '..')]
+    if not parts or not parts[-1].lower().endswith('.srt'):
+        return None
+    if parts[0] == '__MACOSX' or parts[-1].startswith('._'):
+        return None
+    return '/'.join(parts)
+
+
+def _too_large_detail():
+    return f"File size too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+from ..models.translation_job import TranslationStatus
+
+# Latest event kept per job, for clients that connect after it was published
+JOB_EVENTS_MAX_JOBS = int(os.environ.get("JOB_EVENTS_MAX_JOBS", 10_000))
+
+TERMINAL_STATUSES = (TranslationStatus.COMPLETED.value, TranslationStatus.FAILED.value)
+
+
+class JobEventBus:
+    """
+    In-process publish/subscribe of translation job state.
+
+    Workers publish from their threads; SSE and long-poll handlers on the event
+    loop subscribe to a job and are woken when its state changes, so waiting
+    clients cost no database queries. Events carry a version that increases
+    with every publish, which long-poll clients send back as 'since'.
+    """
+
+    def __init__(self, max_jobs=JOB_EVENTS_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self._latest = OrderedDict()
+        self._subscribers = {}
+
+    def publish(self, job_id, status, progress=None, error_message=None):
+        """
+        Records a job's new state and wakes its subscribers. Publishing an unchanged
+        state does nothing. Safe to call from any thread.
+
+        Args:
+            job_id (int): The job.
+            status (str): TranslationStatus value.
+            progress (int optional): Percentage of the job's sentences translated so far.
+            error_message (str optional): Error of a failed or retrying attempt.
+        """
+        status = getattr(status, 'value', status)
+        with self._lock:
+            previous = self._latest.get(job_id)
+            if progress is None:
+                progress = 100 if status == TranslationStatus.COMPLETED.value else (
+                    previous["progress"] if previous is not None and status != TranslationStatus.PENDING.value else 0
+                )
+            if (previous is not None and previous["status"] == status and previous["progress"] == progress
+                    and previous["error_message"] == error_message):
+                return previous
+            event = {
+                "job_id": job_id,
+                "status": status,
+                "progress": progress,
+                "error_message": error_message,
+                "version": next(self._versions),
+            }
+            self._latest[job_id] = event
+            self._latest.move_to_end(job_id)
+            while len(self._latest) > self.max_jobs:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; it is dropped on unsubscribe
+                pass
+        return event
+
+    def latest(self, job_id):
+        """Returns the last event published for a job, or None."""
+        with self._lock:
+            return self._latest.get(job_id)
+
+    def subscribe(self, job_id):
+        """
+        Registers the running event loop for a job's events.
+
+        Returns:
+            asyncio.Queue: Receives every event published from now on. Pass it to unsubscribe when done.
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def wait(self, job_id, since, timeout):
+        """
+        Long-poll: waits until the job has an event newer than since.
+
+        Returns:
+            dict: The newest event, or None if nothing happened within timeout seconds.
+        """
+        event = self.latest(job_id)
+        if event is not None and event["version"] > since:
+            return event
+        queue = self.subscribe(job_id)
+        try:
+            # Re-check: an event may have been published before the subscription
+            event = self.latest(job_id)
+            if event is not None and event["version"] > since:
+                return event
+            return await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.unsubscribe(job_id, queue)
+
+
+job_event_bus = JobEventBus()
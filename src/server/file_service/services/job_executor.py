@@ -0,0 +1,49 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+TRANSLATION_WORKERS = int(os.environ.get("TRANSLATION_WORKERS", 4))
+TRANSLATION_QUEUE_SIZE = int(os.environ.get("TRANSLATION_QUEUE_SIZE", 64))
+
+
+class JobExecutor:
+    """
+    Runs blocking translation jobs on a fixed-size thread pool, off the event loop.
+
+    At most max_workers jobs run and max_queue_size wait at any time. Callers
+    reserve a slot before doing any work for a job, so a full queue can be
+    reported to the client (backpressure) instead of piling up jobs in memory.
+    """
+
+    def __init__(self, max_workers=TRANSLATION_WORKERS, max_queue_size=TRANSLATION_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translation")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+
+    def reserve(self):
+        """
+        Reserves a slot for one job without blocking.
+
+        Returns:
+            bool: False if the queue is full.
+        """
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        """Gives back a reserved slot that will not be submitted."""
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs fn on the pool using a slot previously obtained from reserve().
+        The slot is released once fn finishes, whether it succeeds or not.
+        """
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._slots.release()
+
+        return self._executor.submit(run)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
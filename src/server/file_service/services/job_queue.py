@@ -0,0 +1,217 @@
+import os
+import random
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from ..models.translation_job import TranslationJob, TranslationStatus
+
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", 10))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", 600))
+# Files of one batch are claimed together, and share DeepL requests, up to this total size
+BATCH_PACK_BYTES = int(os.environ.get("BATCH_PACK_BYTES", 256 * 1024))
+
+
+def _claimable(now: datetime):
+    """
+    Jobs that are due, plus jobs whose worker stopped heartbeating (crashed or killed).
+    Coalesced jobs are never claimed, they follow their source job.
+    """
+    return and_(TranslationJob.source_job_id.is_(None), or_(
+        and_(
+            TranslationJob.status == TranslationStatus.PENDING,
+            or_(TranslationJob.next_attempt_at.is_(None), TranslationJob.next_attempt_at <= now)
+        ),
+        and_(
+            TranslationJob.status == TranslationStatus.PROCESSING,
+            or_(TranslationJob.lease_expires_at.is_(None), TranslationJob.lease_expires_at < now)
+        )
+    ))
+
+
+def claim_jobs(db: Session, worker_id: str, job_ids=None, lease_seconds: int = JOB_LEASE_SECONDS):
+    """
+    Atomically leases claimable jobs to a worker.
+
+    Without job_ids the oldest due job is claimed together with every other due
+    job for the same original file, so the file is parsed once for all of its
+    languages. When that job belongs to a batch, other due files of the batch are
+    added (only the jobs of that batch) while their total size stays within
+    BATCH_PACK_BYTES, so small files are translated in shared requests. The
+    claim is a single conditional UPDATE, so when several workers race for the
+    same rows only one of them gets each row.
+
+    Args:
+        db (Session): Database session.
+        worker_id (str): Identifies the worker process in the lease.
+        job_ids (list optional): Restrict the claim to these jobs.
+        lease_seconds (int optional): How long the lease lasts without a heartbeat.
+    Returns:
+        list: The claimed TranslationJob rows, empty if nothing was claimable.
+    """
+    now = datetime.utcnow()
+    if job_ids is None:
+        head = (db.query(TranslationJob.id, TranslationJob.original_file_path, TranslationJob.batch_id)
+                .filter(_claimable(now))
+                .order_by(TranslationJob.next_attempt_at, TranslationJob.id)
+                .first())
+        if head is None:
+            return []
+        if head.original_file_path is None:
+            criteria = TranslationJob.id == head.id
+        elif head.batch_id is not None:
+            # Every job of the head's file, but only the batch's own jobs of the files packed with it
+            criteria = or_(
+                TranslationJob.original_file_path == head.original_file_path,
+                and_(TranslationJob.batch_id == head.batch_id,
+                     TranslationJob.previous_job_id.is_(None),
+                     TranslationJob.original_file_path.in_(_pack_batch_files(db, head, now)))
+            )
+        else:
+            criteria = TranslationJob.original_file_path == head.original_file_path
+    else:
+        criteria = TranslationJob.id.in_(job_ids)
+
+    lease_owner = f"{worker_id}:{uuid4().hex}"
+    claimed = (db.query(TranslationJob)
+               .filter(criteria, _claimable(now))
+               .update({
+                   TranslationJob.status: TranslationStatus.PROCESSING,
+                   TranslationJob.lease_owner: lease_owner,
+                   TranslationJob.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                   TranslationJob.heartbeat_at: now,
+                   TranslationJob.attempts: TranslationJob.attempts + 1,
+               }, synchronize_session=False))
+    db.commit()
+    if not claimed:
+        return []
+    return leased_jobs(db, lease_owner)
+
+
+def _pack_batch_files(db: Session, head, now: datetime):
+    """Picks the head job's file plus other due files of its batch, up to BATCH_PACK_BYTES in total."""
+    paths = [head.original_file_path]
+    total = _file_size(head.original_file_path)
+    rows = (db.query(TranslationJob.original_file_path)
+            .filter(TranslationJob.batch_id == head.batch_id,
+                    TranslationJob.previous_job_id.is_(None),
+                    TranslationJob.original_file_path != head.original_file_path,
+                    _claimable(now))
+            .distinct())
+    for row in rows:
+        size = _file_size(row.original_file_path)
+        if total + size > BATCH_PACK_BYTES:
+            continue
+        paths.append(row.original_file_path)
+        total += size
+    return paths
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def find_reusable_job(db: Session, content_hash: str, target_language: str):
+    """
+    Finds a job that already translated (or is translating) the same content into the same language.
+
+    Returns:
+        TranslationJob: The newest completed job whose output still exists, else the
+        oldest in-flight one, else None.
+    """
+    candidates = (db.query(TranslationJob)
+                  .filter(TranslationJob.content_hash == content_hash,
+                          TranslationJob.target_language == target_language,
+                          TranslationJob.source_job_id.is_(None),
+                          TranslationJob.status == TranslationStatus.COMPLETED)
+                  .order_by(TranslationJob.id.desc()))
+    for job in candidates:
+        if job.translated_file_path and os.path.exists(job.translated_file_path):
+            return job
+
+    return (db.query(TranslationJob)
+            .filter(TranslationJob.content_hash == content_hash,
+                    TranslationJob.target_language == target_language,
+                    TranslationJob.source_job_id.is_(None),
+                    TranslationJob.status.in_([TranslationStatus.PENDING, TranslationStatus.PROCESSING]))
+            .order_by(TranslationJob.id)
+            .first())
+
+
+def resolve_followers(db: Session, job: TranslationJob):
+    """Copies a job's final outcome onto the jobs coalesced into it. The caller commits."""
+    if job.status not in (TranslationStatus.COMPLETED, TranslationStatus.FAILED):
+        return
+    (db.query(TranslationJob)
+     .filter(TranslationJob.source_job_id == job.id)
+     .update({
+         TranslationJob.status: job.status,
+         TranslationJob.translated_file_path: job.translated_file_path,
+         TranslationJob.translated_file_size: job.translated_file_size,
+         TranslationJob.error_message: job.error_message,
+     }, synchronize_session=False))
+
+
+def leased_jobs(db: Session, lease_owner: str):
+    """Returns the jobs currently held under a lease."""
+    return db.query(TranslationJob).filter(TranslationJob.lease_owner == lease_owner).all()
+
+
+def heartbeat(db: Session, lease_owner: str, lease_seconds: int = JOB_LEASE_SECONDS):
+    """
+    Extends a lease that is still running.
+
+    Returns:
+        int: Number of jobs still held, 0 if the lease was lost to another worker.
+    """
+    now = datetime.utcnow()
+    extended = (db.query(TranslationJob)
+                .filter(TranslationJob.lease_owner == lease_owner,
+                        TranslationJob.status == TranslationStatus.PROCESSING)
+                .update({
+                    TranslationJob.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                    TranslationJob.heartbeat_at: now,
+                }, synchronize_session=False))
+    db.commit()
+    return extended
+
+
+def retry_delay(attempts: int):
+    """Exponential backoff with jitter for the given number of attempts made so far."""
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def complete_job(job: TranslationJob, translated_file_path: str):
+    """Marks a leased job as completed and releases its lease. The caller commits."""
+    job.status = TranslationStatus.COMPLETED
+    job.translated_file_path = translated_file_path
+    job.error_message = None
+    _release_lease(job)
+
+
+def fail_job(job: TranslationJob, error_message: str):
+    """
+    Puts a leased job back in the queue with a backoff delay, or marks it FAILED
+    once it used up JOB_MAX_ATTEMPTS. Its saved batches are kept either way, so a
+    retry or a resume only translates the rest. The caller commits.
+    """
+    job.error_message = error_message
+    if job.attempts < JOB_MAX_ATTEMPTS:
+        job.status = TranslationStatus.PENDING
+        job.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+    else:
+        job.status = TranslationStatus.FAILED
+    _release_lease(job)
+
+
+def _release_lease(job: TranslationJob):
+    job.lease_owner = None
+    job.lease_expires_at = None
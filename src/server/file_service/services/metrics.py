@@ -0,0 +1,87 @@
+import threading
+
+from ...translation_service.RequestScheduler import get_request_scheduler
+from ...translation_service.TranslationMemory import get_translation_memory
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsRegistry:
+    """
+    Process-wide aggregate of finished translation jobs, rendered in the
+    Prometheus text exposition format by the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self.stage_seconds = {}
+        self.stage_count = {}
+        self.counters = {}
+
+    def observe_job(self, status, job_metrics):
+        """
+        Adds one finished job attempt.
+
+        Args:
+            status (str): Outcome of the attempt, e.g. 'completed', 'failed' or 'retrying'.
+            job_metrics (dict): JobMetrics.as_dict() of the attempt.
+        """
+        with self._lock:
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+            for stage, seconds in job_metrics.get("stages", {}).items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+                self.stage_count[stage] = self.stage_count.get(stage, 0) + 1
+            for name, value in job_metrics.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def render(self):
+        lines = [
+            "# HELP srt_translation_jobs_total Finished translation job attempts by outcome.",
+            "# TYPE srt_translation_jobs_total counter",
+        ]
+        with self._lock:
+            for status, count in sorted(self.jobs.items()):
+                lines.append(f'srt_translation_jobs_total{{status="{status}"}} {count}')
+
+            lines.append("# HELP srt_translation_stage_seconds Wall time spent per pipeline stage.")
+            lines.append("# TYPE srt_translation_stage_seconds summary")
+            for stage in sorted(self.stage_seconds):
+                lines.append(f'srt_translation_stage_seconds_sum{{stage="{stage}"}} {self.stage_seconds[stage]:.6f}')
+                lines.append(f'srt_translation_stage_seconds_count{{stage="{stage}"}} {self.stage_count[stage]}')
+
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE srt_translation_{name}_total counter")
+                lines.append(f"srt_translation_{name}_total {self.counters[name]}")
+
+        scheduler = get_request_scheduler().snapshot()
+        lines.extend([
+            "# HELP srt_deepl_requests_total Requests sent to DeepL, retries included.",
+            "# TYPE srt_deepl_requests_total counter",
+            f"srt_deepl_requests_total {scheduler['requests']}",
+            "# TYPE srt_deepl_retries_total counter",
+            f"srt_deepl_retries_total {scheduler['retries']}",
+            "# HELP srt_deepl_throttled_total DeepL responses that asked to slow down (429, or 456 with Retry-After).",
+            "# TYPE srt_deepl_throttled_total counter",
+            f"srt_deepl_throttled_total {scheduler['throttled']}",
+            "# TYPE srt_deepl_concurrency_limit gauge",
+            f"srt_deepl_concurrency_limit {scheduler['concurrency_limit']}",
+            "# TYPE srt_deepl_in_flight gauge",
+            f"srt_deepl_in_flight {scheduler['in_flight']}",
+        ])
+
+        memory = get_translation_memory().stats()
+        lines.extend([
+            "# TYPE srt_translation_memory_hits_total counter",
+            f"srt_translation_memory_hits_total {memory['hits']}",
+            "# TYPE srt_translation_memory_misses_total counter",
+            f"srt_translation_memory_misses_total {memory['misses']}",
+            "# TYPE srt_translation_memory_characters_saved_total counter",
+            f"srt_translation_memory_characters_saved_total {memory['characters_saved']}",
+            "# TYPE srt_translation_memory_entries gauge",
+            f"srt_translation_memory_entries {memory['entries']}",
+        ])
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
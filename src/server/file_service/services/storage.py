@@ -0,0 +1,317 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import or_, select
+
+from ..database import SessionLocal
+from ..models.translation_chunk import TranslationChunk
+from ..models.translation_job import TranslationJob, TranslationStatus
+from ..settings import (
+    UPLOAD_DIR, TRANSLATED_DIR, STORAGE_MAX_AGE_SECONDS, STORAGE_OWNER_QUOTA_BYTES, STORAGE_GLOBAL_QUOTA_BYTES,
+    STORAGE_CLEANUP_SECONDS, STORAGE_GRACE_SECONDS
+)
+from .downloads import variant_paths, ENCODING_SUFFIXES, HASH_SUFFIX
+
+# Two levels of 256 subdirectories keep directories small up to tens of millions of files
+SHARD_LEVELS = 2
+# Downloads refresh a job's last access at most this often, so reads stay reads
+ACCESS_TOUCH_SECONDS = 300
+# Rows updated per statement when marking jobs evicted
+EVICT_CHUNK_SIZE = 500
+
+FINISHED_STATUSES = (TranslationStatus.COMPLETED, TranslationStatus.FAILED)
+# Files stored next to an output, see downloads.py, and unfinished uploads, see file_handler.py
+_SIDECAR_SUFFIXES = tuple(suffix for _, suffix in ENCODING_SUFFIXES) + (HASH_SUFFIX, ".part")
+
+
+def sharded_path(directory, filename):
+    """
+    Returns where a stored file lives: under hashed subdirectories of directory
+    (e.g. uploads/3f/a2/<filename>), which are created if missing.
+    """
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    shard_dir = os.path.join(directory, *(digest[level * 2:level * 2 + 2] for level in range(SHARD_LEVELS)))
+    os.makedirs(shard_dir, exist_ok=True)
+    return os.path.join(shard_dir, filename)
+
+
+def touch_job(job):
+    """Records a download of the job's files for LRU eviction. The caller commits."""
+    now = datetime.utcnow()
+    if job.last_accessed_at is None or now - job.last_accessed_at > timedelta(seconds=ACCESS_TOUCH_SECONDS):
+        job.last_accessed_at = now
+
+
+class StorageManager:
+    """
+    Keeps UPLOAD_DIR and TRANSLATED_DIR bounded.
+
+    Every TranslationJob accounts for the size of its original and its output.
+    A cleanup pass evicts finished jobs, least recently used first: those idle
+    for longer than max_age_seconds, then those of owners over their quota, then
+    any until the node is under its global quota. An evicted job keeps its row
+    but loses its file paths (downloads answer 410 Gone). Uploads and outputs are
+    shared between jobs with the same content, so a file is deleted only once no
+    job that is still live refers to it. Finally files that no job refers to,
+    e.g. left behind by a crash, are removed along with empty shard directories.
+    """
+
+    def __init__(self, directories=(UPLOAD_DIR, TRANSLATED_DIR), max_age_seconds=STORAGE_MAX_AGE_SECONDS,
+                 owner_quota_bytes=STORAGE_OWNER_QUOTA_BYTES, global_quota_bytes=STORAGE_GLOBAL_QUOTA_BYTES,
+                 grace_seconds=STORAGE_GRACE_SECONDS, lock=None):
+        """
+        Args:
+            lock (threading.Lock optional): Held while deleting files. Pass the lock that guards
+                job reuse so an upload cannot start sharing a file that is being deleted.
+        """
+        self.directories = directories
+        self.max_age_seconds = max_age_seconds
+        self.owner_quota_bytes = owner_quota_bytes
+        self.global_quota_bytes = global_quota_bytes
+        self.grace_seconds = grace_seconds
+        self.lock = lock
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_cleanup(self):
+        """
+        Runs one cleanup pass in its own database session.
+
+        Returns:
+            dict: Counts of evicted jobs, deleted files and freed bytes.
+        """
+        stats = {"evicted_jobs": 0, "deleted_files": 0, "freed_bytes": 0, "orphans_deleted": 0}
+        db = SessionLocal()
+        try:
+            live = self._live_jobs(db)
+            evicted, unreferenced = self._select_evictions(live)
+            now = datetime.utcnow()
+            for start in range(0, len(evicted), EVICT_CHUNK_SIZE):
+                chunk_ids = evicted[start:start + EVICT_CHUNK_SIZE]
+                (db.query(TranslationJob)
+                 .filter(TranslationJob.id.in_(chunk_ids),
+                         # Skips jobs resumed since the snapshot; their files survive the re-check below
+                         TranslationJob.status.in_(FINISHED_STATUSES))
+                 .update({
+                     TranslationJob.files_evicted_at: now,
+                     TranslationJob.original_file_path: None,
+                     TranslationJob.translated_file_path: None,
+                 }, synchronize_session=False))
+                # An evicted job can no longer be resumed, so its saved batches go too
+                (db.query(TranslationChunk)
+                 .filter(TranslationChunk.job_id.in_(
+                     select(TranslationJob.id).where(TranslationJob.id.in_(chunk_ids),
+                                                     TranslationJob.files_evicted_at.isnot(None))))
+                 .delete(synchronize_session=False))
+                db.commit()
+            stats["evicted_jobs"] = len(evicted)
+
+            for path in unreferenced:
+                freed = self._delete_unreferenced(db, path)
+                if freed is not None:
+                    stats["deleted_files"] += 1
+                    stats["freed_bytes"] += freed
+
+            evicted_ids = set(evicted)
+            referenced = {
+                os.path.abspath(path) for job in live if job.id not in evicted_ids
+                for path, _ in _job_files(job)
+            }
+            stats["orphans_deleted"] = self._sweep_orphans(db, referenced)
+        finally:
+            db.close()
+        return stats
+
+    def _live_jobs(self, db):
+        """Projected rows of every job that still has files, with missing sizes filled in and saved."""
+        rows = (db.query(
+                    TranslationJob.id, TranslationJob.owner_id, TranslationJob.status,
+                    TranslationJob.original_file_path, TranslationJob.original_file_size,
+                    TranslationJob.translated_file_path, TranslationJob.translated_file_size,
+                    TranslationJob.last_accessed_at, TranslationJob.updated_at)
+                .filter(TranslationJob.files_evicted_at.is_(None))
+                .all())
+        live = []
+        for row in rows:
+            row = SimpleNamespace(**row._asdict())
+            sizes = {}
+            if row.original_file_path and row.original_file_size is None:
+                sizes[TranslationJob.original_file_size] = _file_size(row.original_file_path)
+            if row.translated_file_path and row.translated_file_size is None:
+                sizes[TranslationJob.translated_file_size] = _file_size(row.translated_file_path)
+            if sizes:
+                db.query(TranslationJob).filter(TranslationJob.id == row.id).update(sizes, synchronize_session=False)
+                for column, size in sizes.items():
+                    setattr(row, column.key, size)
+            live.append(row)
+        db.commit()
+        return live
+
+    def _select_evictions(self, live):
+        """
+        Returns:
+            tuple: (ids of the jobs to evict, paths no remaining job refers to)
+        """
+        references = {}
+        path_sizes = {}
+        owner_bytes = {}
+        for job in live:
+            for path, size in _job_files(job):
+                references[path] = references.get(path, 0) + 1
+                path_sizes[path] = size
+                owner_bytes[job.owner_id] = owner_bytes.get(job.owner_id, 0) + size
+        total_bytes = sum(path_sizes.values())
+
+        evicted = []
+        unreferenced = []
+
+        def evict(job):
+            nonlocal total_bytes
+            evicted.append(job.id)
+            for path, size in _job_files(job):
+                owner_bytes[job.owner_id] -= size
+                references[path] -= 1
+                if references[path] == 0:
+                    total_bytes -= size
+                    unreferenced.append(path)
+
+        # Only finished jobs give up their files; pending and running jobs still need them
+        candidates = sorted(
+            (job for job in live if job.status in FINISHED_STATUSES),
+            key=lambda job: (job.last_accessed_at or job.updated_at or datetime.min, job.id)
+        )
+        expired_before = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+        remaining = []
+        for job in candidates:
+            if self.max_age_seconds and (job.last_accessed_at or job.updated_at or datetime.min) < expired_before:
+                evict(job)
+            elif self.owner_quota_bytes and owner_bytes[job.owner_id] > self.owner_quota_bytes:
+                evict(job)
+            else:
+                remaining.append(job)
+        if self.global_quota_bytes:
+            for job in remaining:
+                if total_bytes <= self.global_quota_bytes:
+                    break
+                evict(job)
+        return evicted, unreferenced
+
+    def _delete_unreferenced(self, db, path):
+        """Deletes a file (and its download variants) unless a job started using it meanwhile. Returns the bytes freed."""
+        with self.lock or nullcontext():
+            still_used = (db.query(TranslationJob.id)
+                          .filter(TranslationJob.files_evicted_at.is_(None),
+                                  or_(TranslationJob.original_file_path == path,
+                                      TranslationJob.translated_file_path == path))
+                          .first())
+            if still_used is not None or self._recently_changed(path):
+                return None
+            freed = 0
+            for file_path in [path] + variant_paths(path):
+                try:
+                    freed += os.path.getsize(file_path)
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    continue
+            return freed
+
+    def _sweep_orphans(self, db, referenced):
+        """
+        Deletes files no job refers to and prunes empty shard directories. Returns the files deleted.
+
+        referenced, taken from the snapshot, only narrows down the candidates: a job may
+        have started sharing one of them since (e.g. an upload reusing an output), so
+        they are checked against the jobs' current paths under the lock before deletion.
+        """
+        candidates = []
+        for directory in self.directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    owner_path = os.path.abspath(path)
+                    for suffix in _SIDECAR_SUFFIXES:
+                        if owner_path.endswith(suffix):
+                            owner_path = owner_path[:-len(suffix)]
+                            break
+                    if owner_path not in referenced and not self._recently_changed(path):
+                        candidates.append((path, owner_path))
+
+        deleted = 0
+        if candidates:
+            with self.lock or nullcontext():
+                current = _referenced_paths(db)
+                for path, owner_path in candidates:
+                    if owner_path in current or self._recently_changed(path):
+                        continue
+                    try:
+                        os.remove(path)
+                        deleted += 1
+                    except FileNotFoundError:
+                        pass
+
+        for directory in self.directories:
+            for root, _, _ in os.walk(directory, topdown=False):
+                if os.path.abspath(root) != os.path.abspath(directory):
+                    try:
+                        os.rmdir(root)
+                    except OSError:
+                        # Not empty, or a file was just written into it
+                        pass
+        return deleted
+
+    def _recently_changed(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) < self.grace_seconds
+        except FileNotFoundError:
+            return False
+
+    def start(self, interval_seconds=STORAGE_CLEANUP_SECONDS):
+        """Runs run_cleanup every interval_seconds on a background thread."""
+        if not interval_seconds or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval_seconds,), name="storage-cleanup",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval_seconds):
+        while not self._stop.wait(interval_seconds):
+            try:
+                stats = self.run_cleanup()
+            except Exception as e:
+                print(f"Storage cleanup failed: {str(e)}")
+                continue
+            if any(stats.values()):
+                print(f"Storage cleanup: evicted {stats['evicted_jobs']} jobs, deleted {stats['deleted_files']} "
+                      f"files ({stats['freed_bytes']} bytes) and {stats['orphans_deleted']} orphaned files")
+
+
+def _referenced_paths(db):
+    """Absolute paths of every file a job that still has files refers to, as committed right now."""
+    rows = (db.query(TranslationJob.original_file_path, TranslationJob.translated_file_path)
+            .filter(TranslationJob.files_evicted_at.is_(None)))
+    return {os.path.abspath(path) for row in rows for path in row if path}
+
+
+def _job_files(job):
+    """(path, size) of each file a job row refers to. Jobs sharing a file store the same path string."""
+    files = []
+    if job.original_file_path:
+        files.append((job.original_file_path, job.original_file_size or 0))
+    if job.translated_file_path:
+        files.append((job.translated_file_path, job.translated_file_size or 0))
+    return files
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
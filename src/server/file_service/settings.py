@@ -0,0 +1,31 @@
+import os
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "/Users/yunseolee/Documents/GitHub/SRTTranslate/src/file_service/uploads/")
+TRANSLATED_DIR = os.environ.get("TRANSLATED_DIR", "/Users/yunseolee/Documents/GitHub/SRTTranslate/src/file_service/translated/")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(TRANSLATED_DIR, exist_ok=True)
+
+# Run queue polling inside the API process. Turn off when dedicated workers
+# (python -m server.file_service.worker) process the queue instead.
+TRANSLATION_EMBEDDED_WORKER = os.environ.get("TRANSLATION_EMBEDDED_WORKER", "1") == "1"
+QUEUE_POLL_SECONDS = float(os.environ.get("QUEUE_POLL_SECONDS", 5))
+
+# How often a status stream sends a keepalive and re-reads the job from the
+# database, which catches updates made by workers in other processes
+JOB_EVENTS_REFRESH_SECONDS = float(os.environ.get("JOB_EVENTS_REFRESH_SECONDS", 15))
+# Longest a long-poll status request waits for a change
+JOB_EVENTS_MAX_WAIT_SECONDS = float(os.environ.get("JOB_EVENTS_MAX_WAIT_SECONDS", 60))
+
+# Largest page /translations/ returns
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 100))
+
+# Storage lifecycle, see services/storage.py. Files of finished jobs not downloaded
+# for STORAGE_MAX_AGE_SECONDS are removed, and the least recently used are removed
+# early while an owner or the whole node is over its quota (0 disables a quota).
+STORAGE_MAX_AGE_SECONDS = int(os.environ.get("STORAGE_MAX_AGE_SECONDS", 30 * 24 * 3600))
+STORAGE_OWNER_QUOTA_BYTES = int(os.environ.get("STORAGE_OWNER_QUOTA_BYTES", 1024 * 1024 * 1024))
+STORAGE_GLOBAL_QUOTA_BYTES = int(os.environ.get("STORAGE_GLOBAL_QUOTA_BYTES", 50 * 1024 * 1024 * 1024))
+# How often the API process runs the cleanup; 0 turns it off (e.g. on all but one node)
+STORAGE_CLEANUP_SECONDS = float(os.environ.get("STORAGE_CLEANUP_SECONDS", 600))
+# Files changed this recently are never deleted, so uploads still being registered survive
+STORAGE_GRACE_SECONDS = int(os.environ.get("STORAGE_GRACE_SECONDS", 3600))
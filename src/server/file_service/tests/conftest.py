@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# The service is imported as the server package, the way it runs from src/
+# (python -m server.file_service.worker)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# The database, storage directories and translation memory are chosen at import
+# time, so point them at a scratch directory before the service is imported
+_scratch_dir = tempfile.mkdtemp(prefix="srt-file-service-tests-")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(_scratch_dir, 'translation_jobs.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_scratch_dir, "uploads"))
+os.environ.setdefault("TRANSLATED_DIR", os.path.join(_scratch_dir, "translated"))
+os.environ.setdefault("TRANSLATION_MEMORY_PATH", os.path.join(_scratch_dir, "translation_memory.db"))
+os.environ.setdefault("TRANSLATION_EMBEDDED_WORKER", "0")
+os.environ.setdefault("STORAGE_CLEANUP_SECONDS", "0")
+os.environ.setdefault("DEEPL_AUTH_KEY", "test")
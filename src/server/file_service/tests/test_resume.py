@@ -0,0 +1,89 @@
+import pytest
+
+from server.translation_service import SRTTranslate
+from server.translation_service.SRTTranslate import (
+    batch_subtitle_elements, break_into_sentences, build_subtitle_elements, iter_srt_cues
+)
+from server.translation_service import TranslatorBackend
+from server.translation_service.TranslatorBackend import FakeTranslatorBackend, set_backend
+from server.file_service.database import SessionLocal, init_db
+from server.file_service.main import resume_translation
+from server.file_service.models.translation_job import TranslationJob, TranslationStatus
+from server.file_service.services.checkpoint import JobCheckpoint
+from server.file_service.services.job_queue import JOB_MAX_ATTEMPTS
+from server.file_service.worker import process_translation
+
+MAX_CHUNK_BYTES = 1500
+
+
+def _write_srt(path, cue_count):
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(1, cue_count + 1):
+            start, end = index * 2000, index * 2000 + 1500
+            f.write(f"{index}\n00:{start // 60000:02d}:{start // 1000 % 60:02d},000 --> "
+                    f"00:{end // 60000:02d}:{end // 1000 % 60:02d},500\n"
+                    f"Line number {index} of the episode, said slowly.\n\n")
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Lets the test swap the process-wide backend with set_backend and restores it afterwards."""
+    monkeypatch.setattr(TranslatorBackend, "_backend", TranslatorBackend._backend)
+
+
+def test_resume_after_terminal_failure_sends_only_missing_batches(db, backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(SRTTranslate, "DEEPL_MAX_CHUNK_BYTES", MAX_CHUNK_BYTES)
+    monkeypatch.setattr(SRTTranslate, "DEEPL_MAX_WORKERS", 1)
+    srt_path = str(tmp_path / "episode.srt")
+    _write_srt(srt_path, 200)
+    sentences = break_into_sentences(iter_srt_cues(srt_path))
+    total_batches = len(batch_subtitle_elements(build_subtitle_elements(sentences), MAX_CHUNK_BYTES))
+    assert total_batches > 3
+
+    def fail_from_third_request(xml_string, target_lang):
+        if len(failing.requests) >= 3:
+            raise RuntimeError("read timed out")
+        return xml_string
+
+    failing = FakeTranslatorBackend(translate=fail_from_third_request)
+    set_backend(failing)
+    job = TranslationJob(
+        original_filename="episode.srt",
+        original_file_path=srt_path,
+        target_language="JA",
+        status=TranslationStatus.PENDING,
+        owner_id="owner",
+        # The claim below uses up the last attempt
+        attempts=JOB_MAX_ATTEMPTS - 1
+    )
+    db.add(job)
+    db.commit()
+
+    process_translation([job.id])
+    db.refresh(job)
+    assert job.status == TranslationStatus.FAILED
+    saved = len(JobCheckpoint(job.id).load())
+    assert saved == 2
+
+    resume_translation(job.id, db, "owner")
+    db.refresh(job)
+    assert job.status == TranslationStatus.PENDING
+
+    resumed = FakeTranslatorBackend()
+    set_backend(resumed)
+    process_translation([job.id])
+    db.refresh(job)
+    assert job.status == TranslationStatus.COMPLETED
+    assert len(resumed.requests) == total_batches - saved
+    # Completion drops the saved batches
+    assert JobCheckpoint(job.id).load() == []
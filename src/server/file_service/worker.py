@@ -0,0 +1,305 @@
+"""
+Standalone translation worker.
+
+Claims jobs from the translation_jobs table and processes them. Any number of
+worker processes, on any number of hosts, can run against the same database:
+
+    python -m server.file_service.worker --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+
+from sqlalchemy.orm import Session
+
+from ..translation_service.SRTTranslate import (
+    srt_translate_many, srt_translate_files, srt_translate_incremental, save_translated_subtitles,
+    SRTTranslationError
+)
+from ..translation_service.TargetLanguage import TargetLanguage
+from ..translation_service.JobMetrics import JobMetrics, timed
+from .database import SessionLocal, init_db
+from .models.translation_job import TranslationJob, TranslationStatus
+from .services.metrics import metrics_registry
+from .services.checkpoint import JobCheckpoint, clear_checkpoint
+from .services.downloads import store_download_variants
+from .services.storage import sharded_path
+from .services.job_events import job_event_bus
+from .services.job_queue import (
+    JOB_LEASE_SECONDS, claim_jobs, heartbeat, complete_job, fail_job, resolve_followers
+)
+from .settings import TRANSLATED_DIR, QUEUE_POLL_SECONDS
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseHeartbeat:
+    """
+    Keeps a lease alive from a background thread while its jobs are processed,
+    so that only jobs of a dead worker ever become claimable again.
+    """
+
+    def __init__(self, lease_owner: str, lease_seconds: int = JOB_LEASE_SECONDS):
+        self.lease_owner = lease_owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            db = SessionLocal()
+            try:
+                heartbeat(db, self.lease_owner, self.lease_seconds)
+            except Exception as e:
+                print(f"Heartbeat for {self.lease_owner} failed: {str(e)}")
+            finally:
+                db.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_claimed_jobs(db: Session, jobs):
+    """
+    Translates the claimed jobs into every job's language and records each job's
+    outcome. A file is parsed and segmented only once for all of its languages;
+    several small files of a batch are packed into shared DeepL requests.
+    """
+    job_metrics = {job.id: JobMetrics() for job in jobs}
+    for job in jobs:
+        job_event_bus.publish(job.id, TranslationStatus.PROCESSING, progress=0)
+    with LeaseHeartbeat(jobs[0].lease_owner), timed(job_metrics.values(), "total"):
+        try:
+            job_langs = {job.id: TargetLanguage(job.target_language) for job in jobs}
+            for job in jobs:
+                job_metrics[job.id].incr("retries", job.attempts - 1)
+
+            # Revisions of earlier jobs are diffed against them; everything else is
+            # translated in full, sharing one parse across languages
+            revisions = [job for job in jobs if job.previous_job_id is not None]
+            full_jobs = [job for job in jobs if job.previous_job_id is None]
+
+            results = {}
+            errors = {}
+            file_paths = list(dict.fromkeys(job.original_file_path for job in full_jobs))
+            if len(file_paths) > 1:
+                file_errors = {}
+                # Each file only in the languages its own jobs ask for
+                file_results = srt_translate_files(
+                    file_paths, list({job_langs[job.id] for job in full_jobs}), file_errors,
+                    metrics={(job.original_file_path, job_langs[job.id]): job_metrics[job.id] for job in full_jobs},
+                    progress=_progress_callbacks(full_jobs, job_langs),
+                    pairs={(job.original_file_path, job_langs[job.id]) for job in full_jobs}
+                )
+                for job in full_jobs:
+                    key = (job.original_file_path, job_langs[job.id])
+                    if key in file_errors:
+                        errors[job.id] = file_errors[key]
+                    else:
+                        results[job.id] = file_results[key]
+            elif full_jobs:
+                language_errors = {}
+                language_results = srt_translate_many(
+                    file_paths[0], list({job_langs[job.id] for job in full_jobs}), language_errors,
+                    metrics={job_langs[job.id]: job_metrics[job.id] for job in full_jobs},
+                    checkpoints={job_langs[job.id]: JobCheckpoint(job.id) for job in full_jobs},
+                    progress=_progress_callbacks(full_jobs, job_langs)
+                )
+                for job in full_jobs:
+                    target_lang = job_langs[job.id]
+                    if target_lang in language_errors:
+                        errors[job.id] = language_errors[target_lang]
+                    else:
+                        results[job.id] = language_results[target_lang]
+            for job in revisions:
+                try:
+                    results[job.id] = _translate_revision(db, job, job_langs[job.id], job_metrics[job.id])
+                except SRTTranslationError as e:
+                    errors[job.id] = e
+
+            for job in jobs:
+                target_lang = job_langs[job.id]
+                if job.id in errors:
+                    fail_job(job, str(errors[job.id]))
+                    continue
+
+                # Save translated subtitles as a new file, named by content so users never collide
+                translated_filename = f"{job.content_hash or job.id}-{target_lang.value}.srt"
+                translated_file_path = sharded_path(TRANSLATED_DIR, translated_filename)
+                with job_metrics[job.id].stage("write"):
+                    _write_output(results[job.id], translated_file_path)
+                job.translated_file_size = os.path.getsize(translated_file_path)
+                job_metrics[job.id].incr("bytes_written", job.translated_file_size)
+                complete_job(job, translated_file_path)
+                clear_checkpoint(db, job.id)
+        except Exception as e:
+            # Put back whatever did not complete, with a retry delay
+            for job in jobs:
+                if job.status != TranslationStatus.COMPLETED:
+                    fail_job(job, str(e))
+
+    for job in jobs:
+        job.metrics = job_metrics[job.id].as_dict()
+        metrics_registry.observe_job(_outcome(job), job.metrics)
+        resolve_followers(db, job)
+    db.commit()
+    # Coalesced jobs are watched through their source job, see main.py
+    for job in jobs:
+        job_event_bus.publish(job.id, job.status, error_message=job.error_message)
+
+
+def _write_output(translated_subs, translated_file_path):
+    """
+    Writes a translated output next to its final path and moves it into place, so
+    jobs already serving the same content-addressed file never see it half written,
+    then regenerates its download variants.
+    """
+    fd, part_path = tempfile.mkstemp(dir=os.path.dirname(translated_file_path),
+                                     prefix=os.path.basename(translated_file_path) + ".", suffix=".part")
+    os.close(fd)
+    try:
+        save_translated_subtitles(translated_subs, part_path)
+        os.replace(part_path, translated_file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    store_download_variants(translated_file_path)
+
+
+def _progress_callbacks(jobs, job_langs):
+    """Builds the on_progress callback of each target language, publishing the percentage of its jobs."""
+    def publish_progress(job_ids):
+        def on_progress(done, total):
+            # 100 is only reached once the output is written
+            percent = min(99, done * 100 // total) if total else 0
+            for job_id in job_ids:
+                job_event_bus.publish(job_id, TranslationStatus.PROCESSING, progress=percent)
+        return on_progress
+
+    return {
+        target_lang: publish_progress([job.id for job in jobs if job_langs[job.id] == target_lang])
+        for target_lang in set(job_langs.values())
+    }
+
+
+def _translate_revision(db: Session, job, target_lang, metrics):
+    """
+    Translates a revised upload incrementally against the job it revises, falling
+    back to a full translation when the previous job's files are no longer usable.
+    """
+    previous = db.query(TranslationJob).filter(TranslationJob.id == job.previous_job_id).first()
+    if (previous is not None and previous.status == TranslationStatus.COMPLETED
+            and previous.original_file_path and os.path.exists(previous.original_file_path)
+            and previous.translated_file_path and os.path.exists(previous.translated_file_path)):
+        return srt_translate_incremental(
+            job.original_file_path, target_lang, previous.original_file_path, previous.translated_file_path,
+            metrics=metrics
+        )
+
+    errors = {}
+    results = srt_translate_many(job.original_file_path, [target_lang], errors, metrics={target_lang: metrics})
+    if target_lang in errors:
+        raise errors[target_lang]
+    return results[target_lang]
+
+
+def _outcome(job):
+    if job.status == TranslationStatus.PENDING:
+        return "retrying"
+    return job.status.value
+
+
+def process_translation(job_ids, worker_id=None):
+    """
+    Claims the given jobs and processes them. Does nothing for jobs another worker already holds.
+    """
+    db = SessionLocal()
+    try:
+        jobs = claim_jobs(db, worker_id or default_worker_id(), job_ids=job_ids)
+        if jobs:
+            run_claimed_jobs(db, jobs)
+    finally:
+        db.close()
+
+
+def process_next_translation(worker_id=None, on_claimed=None):
+    """
+    Claims the next due file's jobs and processes them right away. The lease is
+    only taken by a thread that is free to run the jobs and heartbeat it, so it
+    never expires while the jobs wait for a thread.
+
+    Args:
+        worker_id (str optional): Identifies the worker process in the lease.
+        on_claimed (callable optional): Called with True as soon as jobs were claimed,
+            or with False if the queue was empty or the claim failed.
+    Returns:
+        bool: Whether any jobs were claimed.
+    """
+    worker_id = worker_id or default_worker_id()
+    db = SessionLocal()
+    try:
+        try:
+            jobs = claim_jobs(db, worker_id)
+        except Exception as e:
+            print(f"Worker {worker_id} failed to claim a job: {str(e)}")
+            jobs = []
+        if on_claimed is not None:
+            on_claimed(bool(jobs))
+        if jobs:
+            run_claimed_jobs(db, jobs)
+        return bool(jobs)
+    finally:
+        db.close()
+
+
+def run_worker(worker_id=None, poll_interval=QUEUE_POLL_SECONDS, stop_event=None):
+    """
+    Processes queued jobs until stop_event is set, sleeping poll_interval whenever the queue is empty.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    print(f"Translation worker {worker_id} started")
+    while not stop_event.is_set():
+        if not process_next_translation(worker_id):
+            stop_event.wait(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued SRT translation jobs.")
+    parser.add_argument("--processes", type=int, default=1, help="Number of worker processes to run.")
+    parser.add_argument("--poll-interval", type=float, default=QUEUE_POLL_SECONDS,
+                        help="Seconds to wait when the queue is empty.")
+    args = parser.parse_args()
+
+    init_db()
+    if args.processes <= 1:
+        run_worker(poll_interval=args.poll_interval)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, kwargs={"poll_interval": args.poll_interval})
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Offline bulk translation of a directory tree of SRT files, without the HTTP API:
+
+    python -m server.translation_service.BatchTranslate input_dir output_dir --lang JA KO
+
+Parsing, segmentation and mapping run on a process pool; the DeepL requests of
+all files go through one shared backend from a thread pool. Outputs mirror the
+input tree as <name>-<LANG>.srt. A manifest in output_dir records the hash each
+output was translated from, so re-runs (e.g. a nightly backfill) only translate
+new or changed files.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .SRTTranslate import (
+    break_into_sentences, build_subtitle_elements, iter_srt_cues, translate_sentences, map_sentences_back_split,
+    save_translated_subtitles, check_deepl_quota, SRTTranslationError
+)
+from .TargetLanguage import TargetLanguage
+from .TranslatorBackend import get_backend, _BACKEND_FACTORIES
+from .JobMetrics import JobMetrics
+
+MANIFEST_NAME = ".srt_translate_manifest.json"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def find_srt_files(input_dir):
+    """Returns the paths of all .srt files under input_dir, relative to it, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.srt'):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return found
+
+
+def output_path(output_dir, relative_path, target_lang):
+    return os.path.join(output_dir, f"{os.path.splitext(relative_path)[0]}-{target_lang.value}.srt")
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def prepare_file(srt_path, entry, outputs):
+    """
+    Process pool task: decides which languages of a file are out of date and, if
+    any are, parses and segments it.
+
+    The file is only hashed when its size or mtime differ from the manifest entry,
+    and a language is up to date when its output exists and was translated from
+    the same hash.
+
+    Args:
+        srt_path (str): The source file.
+        entry (dict): Its manifest entry, empty if it was never translated.
+        outputs (dict): Output path per target language.
+    Returns:
+        dict: 'sha256', 'size', 'mtime_ns', 'stale' (languages to translate) and, when
+        any are stale, 'sentences', 'elements' and 'cues'.
+    """
+    stat = os.stat(srt_path)
+    if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        sha256 = entry['sha256']
+    else:
+        sha256 = _file_sha256(srt_path)
+    translated = entry.get('languages', {})
+    stale = [
+        target_lang for target_lang, path in outputs.items()
+        if translated.get(target_lang.value) != sha256 or not os.path.exists(path)
+    ]
+    prepared = {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'stale': stale}
+    if stale:
+        cue_count = 0
+
+        def counted(cues):
+            nonlocal cue_count
+            for cue in cues:
+                cue_count += 1
+                yield cue
+
+        sentences = break_into_sentences(counted(iter_srt_cues(srt_path)))
+        if not sentences:
+            raise SRTTranslationError(f"SRT file is empty: {srt_path}")
+        prepared.update(sentences=sentences, elements=build_subtitle_elements(sentences), cues=cue_count)
+    return prepared
+
+
+def map_and_write(sentences, translated_xml, target_lang, path):
+    """Process pool task: maps a translated document back onto the cues and writes the output file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    save_translated_subtitles(map_sentences_back_split(sentences, translated_xml, target_lang=target_lang), path)
+    return os.path.getsize(path)
+
+
+def translate_tree(input_dir, output_dir, target_langs, processes=None, concurrency=8, backend=None, force=False):
+    """
+    Translates every SRT file under input_dir into target_langs.
+
+    Args:
+        input_dir (str): Root of the source tree.
+        output_dir (str): Root of the output tree, created if missing.
+        target_langs (list): TargetLanguage values.
+        processes (int optional): Size of the parse/segment/map process pool, defaults to the CPU count.
+        concurrency (int optional): Files translated at the same time through the shared backend.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        force (bool optional): Translate everything, ignoring the manifest.
+    Returns:
+        dict: Summary counts and timings, see print_summary.
+    """
+    backend = backend or get_backend()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(output_dir)
+    files = find_srt_files(input_dir)
+    summary = {
+        "files": len(files), "up_to_date": 0, "outputs": 0, "failed": 0, "cues": 0, "sentences": 0,
+        "bytes_written": 0, "counters": {}, "stages": {},
+    }
+    started = time.perf_counter()
+    check_deepl_quota(backend)
+
+    def record(job_metrics):
+        snapshot = job_metrics.as_dict()
+        for name, value in snapshot["counters"].items():
+            summary["counters"][name] = summary["counters"].get(name, 0) + value
+        for name, seconds in snapshot["stages"].items():
+            summary["stages"][name] = summary["stages"].get(name, 0.0) + seconds
+
+    def translate(prepared, target_lang):
+        job_metrics = JobMetrics()
+        translated_xml = translate_sentences(
+            prepared['sentences'], target_lang, elements=prepared['elements'], backend=backend, metrics=job_metrics
+        )
+        return translated_xml, job_metrics
+
+    processes = processes or os.cpu_count() or 1
+    pending_files = iter(files)
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=processes) as process_pool, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch-translate") as thread_pool:
+
+        def submit_prepares():
+            # Bound the parsed files held in memory while they wait for the pools
+            while len(in_flight) < processes * 2 + concurrency:
+                relative_path = next(pending_files, None)
+                if relative_path is None:
+                    return
+                outputs = {target_lang: output_path(output_dir, relative_path, target_lang) for target_lang in target_langs}
+                future = process_pool.submit(
+                    prepare_file, os.path.join(input_dir, relative_path), manifest.get(relative_path, {}), outputs
+                )
+                in_flight[future] = ('prepare', relative_path, outputs)
+
+        try:
+            submit_prepares()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, relative_path, *context = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed_langs = 1 if kind != 'prepare' else len(target_langs)
+                        summary["failed"] += failed_langs
+                        print(f"Failed to translate {relative_path} ({kind}): {str(e)}")
+                        continue
+
+                    if kind == 'prepare':
+                        outputs, = context
+                        entry = manifest.setdefault(relative_path, {})
+                        if entry.get('sha256') != result['sha256']:
+                            entry['languages'] = {}
+                        entry.update(sha256=result['sha256'], size=result['size'], mtime_ns=result['mtime_ns'])
+                        summary["up_to_date"] += len(target_langs) - len(result['stale'])
+                        if result['stale']:
+                            summary["cues"] += result['cues']
+                            summary["sentences"] += len(result['sentences'])
+                        for target_lang in result['stale']:
+                            in_flight[thread_pool.submit(translate, result, target_lang)] = (
+                                'translate', relative_path, result, target_lang, outputs[target_lang]
+                            )
+                    elif kind == 'translate':
+                        prepared, target_lang, path = context
+                        translated_xml, job_metrics = result
+                        record(job_metrics)
+                        in_flight[process_pool.submit(
+                            map_and_write, prepared['sentences'], translated_xml, target_lang, path
+                        )] = ('write', relative_path, prepared['sha256'], target_lang)
+                    else:
+                        sha256, target_lang = context
+                        summary["outputs"] += 1
+                        summary["bytes_written"] += result
+                        manifest[relative_path].setdefault('languages', {})[target_lang.value] = sha256
+                submit_prepares()
+        finally:
+            save_manifest(output_dir, manifest)
+
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def print_summary(summary):
+    seconds = summary["seconds"] or 1e-9
+    counters = summary["counters"]
+    print(f"\n{summary['files']} files scanned in {summary['seconds']:.1f}s")
+    print(f"  outputs written   {summary['outputs']} ({summary['outputs'] / seconds:.2f}/s, "
+          f"{summary['bytes_written'] / 1024 / 1024:.1f} MiB)")
+    print(f"  up to date        {summary['up_to_date']}")
+    print(f"  failed            {summary['failed']}")
+    print(f"  cues translated   {summary['cues']} ({summary['cues'] / seconds:.0f} cues/s)")
+    print(f"  sentences         {summary['sentences']}")
+    print(f"  DeepL requests    {counters.get('requests', 0)}, "
+          f"{counters.get('characters_sent', 0)} characters sent "
+          f"({counters.get('characters_sent', 0) / seconds:.0f} chars/s)")
+    print(f"  memory hits       {counters.get('cache_hits', 0)} of "
+          f"{counters.get('cache_hits', 0) + counters.get('cache_misses', 0)} sentences")
+    for name, stage_seconds in sorted(summary["stages"].items()):
+        print(f"  {name:<17} {stage_seconds:.2f}s (summed over files)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate a directory tree of SRT files.")
+    parser.add_argument("input_dir", help="Directory searched recursively for .srt files.")
+    parser.add_argument("output_dir", help="Directory the translated tree is written to.")
+    parser.add_argument("--lang", nargs="+", required=True, choices=[lang.name for lang in TargetLanguage],
+                        help="Target languages.")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Processes for parsing and mapping (default: CPU count).")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Files translated at the same time over the shared DeepL client.")
+    parser.add_argument("--backend", choices=sorted(_BACKEND_FACTORIES), default=None,
+                        help="Translator backend (default: TRANSLATOR_BACKEND).")
+    parser.add_argument("--force", action="store_true", help="Re-translate files that are up to date.")
+    args = parser.parse_args()
+
+    backend = _BACKEND_FACTORIES[args.backend]() if args.backend else None
+    summary = translate_tree(
+        args.input_dir, args.output_dir, [TargetLanguage[name] for name in args.lang],
+        processes=args.processes, concurrency=args.concurrency, backend=backend, force=args.force
+    )
+    print_summary(summary)
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import unicodedata
+from itertools import accumulate
+
+
+class RedistributionProfile:
+    """
+    Subtitle layout rules of a target language whose text has (almost) no spaces
+    to split on.
+
+    Args:
+        max_line_chars (int): Characters per subtitle line.
+        max_lines (int): Lines per cue. Text is never dropped, so a cue that cannot
+            fit its share in max_lines lines gets longer lines instead.
+        max_chars_per_second (float): Reading speed a cue's display time should allow.
+    """
+
+    def __init__(self, max_line_chars, max_lines, max_chars_per_second):
+        self.max_line_chars = max_line_chars
+        self.max_lines = max_lines
+        self.max_chars_per_second = max_chars_per_second
+
+
+# Common broadcast subtitle guidelines for Japanese and Simplified Chinese
+REDISTRIBUTION_PROFILES = {
+    'JA': RedistributionProfile(max_line_chars=13, max_lines=2, max_chars_per_second=4.0),
+    'ZH-HANS': RedistributionProfile(max_line_chars=16, max_lines=2, max_chars_per_second=9.0),
+}
+# Cues are only extended for reading speed up to this gap before the next cue
+MIN_CUE_GAP_MS = int(os.environ.get("MIN_CUE_GAP_MS", 80))
+
+# Preferred places to cut: right after punctuation or whitespace
+_BREAK_AFTER = frozenset('、。，．！？：；…‥・」』）】〕〉》,.!?:; \n')
+# Kinsoku: characters that must not start a line, and ones that must not end it
+_NO_LINE_START = frozenset('、。，．！？：；…‥・」』）】〕〉》,.!?:;ーぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮヵヶ々〜')
+_NO_LINE_END = frozenset('「『（【〔〈《')
+_JOINERS = frozenset('\u200d\ufe0e\ufe0f')
+
+
+def get_redistribution_profile(target_lang):
+    """
+    Returns the RedistributionProfile of a target language, or None for languages
+    that are split by words.
+
+    Args:
+        target_lang (TargetLanguage or str): Target language or its DeepL code.
+    """
+    return REDISTRIBUTION_PROFILES.get(getattr(target_lang, 'value', target_lang))
+
+
+def _is_break(text, position):
+    """True if text can be cut before position without splitting a grapheme or breaking kinsoku."""
+    char = text[position]
+    previous = text[position - 1]
+    return not (
+        unicodedata.combining(char) or char in _JOINERS or previous == '\u200d'
+        or '\U0001f3fb' <= char <= '\U0001f3ff'
+        or char in _NO_LINE_START or previous in _NO_LINE_END
+    )
+
+
+def _is_hiragana(char):
+    return '\u3041' <= char <= '\u309f'
+
+
+def _break_rank(text, position):
+    """
+    How natural a cut before position is: 0 after punctuation or whitespace, 1 where
+    hiragana (usually a particle or inflection) is followed by another script, which
+    approximates a Japanese phrase boundary without a tokenizer, 2 anywhere else.
+    """
+    if position <= 0 or position >= len(text):
+        return 0
+    previous = text[position - 1]
+    if previous in _BREAK_AFTER:
+        return 0
+    if _is_hiragana(previous) and not _is_hiragana(text[position]):
+        return 1
+    return 2
+
+
+def _snap(text, target, low, high, window):
+    """
+    Picks the cut position in [low, high] within window characters of target, preferring
+    the most natural break (see _break_rank) and then the closest one.
+    """
+    target = min(max(target, low), high)
+    best = None
+    for position in range(max(low, target - window), min(high, target + window) + 1):
+        if 0 < position < len(text) and not _is_break(text, position):
+            continue
+        score = (_break_rank(text, position), abs(position - target))
+        if best is None or score < best[0]:
+            best = (score, position)
+    return best[1] if best is not None else target
+
+
+def split_by_duration(text, durations, profile=None):
+    """
+    Splits text across cues in proportion to how long each cue is on screen.
+
+    All cut targets are computed in one pass from the cumulative durations, then
+    moved to the nearest natural break (punctuation, grapheme and kinsoku aware).
+
+    Args:
+        text (str): The translated sentence.
+        durations (sequence): Display time of each cue in milliseconds.
+        profile (RedistributionProfile optional): Line layout applied to each chunk.
+    Returns:
+        list: One chunk per cue.
+    """
+    text = text.strip()
+    n_chunks = len(durations)
+    if n_chunks == 0:
+        return []
+    if n_chunks == 1:
+        return [wrap_lines(text, profile) if profile else text]
+
+    weights = [max(duration, 1) for duration in durations]
+    total_weight = sum(weights)
+    length = len(text)
+    targets = [round(length * cumulative / total_weight) for cumulative in accumulate(weights[:-1])]
+    window = max(2, length // (n_chunks * 3))
+
+    # Every cue gets some text unless the sentence is too short to split sensibly
+    reserve = 1 if length >= 2 * n_chunks else 0
+    cuts = [0]
+    for k, target in enumerate(targets):
+        low = cuts[-1] + reserve
+        high = max(low, length - reserve * (n_chunks - 1 - k))
+        cuts.append(_snap(text, target, low, high, window))
+    cuts.append(length)
+
+    chunks = [text[start:end].strip() for start, end in zip(cuts, cuts[1:])]
+    if profile:
+        chunks = [wrap_lines(chunk, profile) for chunk in chunks]
+    return chunks
+
+
+def wrap_lines(chunk, profile):
+    """
+    Breaks a cue's text into balanced lines of at most profile.max_line_chars,
+    using at most profile.max_lines lines.
+    """
+    chunk = ' '.join(chunk.split())
+    length = len(chunk)
+    if length <= profile.max_line_chars:
+        return chunk
+    n_lines = min(profile.max_lines, -(-length // profile.max_line_chars))
+    if n_lines <= 1:
+        return chunk
+
+    window = max(2, profile.max_line_chars // 3)
+    cuts = [0]
+    for k in range(1, n_lines):
+        cuts.append(_snap(chunk, round(length * k / n_lines), cuts[-1] + 1, length - 1, window))
+    cuts.append(length)
+    return '\n'.join(line for line in (chunk[start:end].strip() for start, end in zip(cuts, cuts[1:])) if line)
+
+
+def extend_for_reading_speed(chunks, starts, ends, next_start, profile):
+    """
+    Lengthens cues whose text cannot be read at profile.max_chars_per_second, into
+    the silence before the following cue but never closer than MIN_CUE_GAP_MS to it.
+
+    Args:
+        chunks (list): Text of each cue.
+        starts (sequence): Start of each cue in milliseconds.
+        ends (sequence): End of each cue in milliseconds.
+        next_start (int): Start of the cue after the last one, None at the end of the file.
+        profile (RedistributionProfile): Reading speed to meet.
+    Returns:
+        list: The end of each cue in milliseconds.
+    """
+    new_ends = list(ends)
+    for i, chunk in enumerate(chunks):
+        characters = len(chunk) - chunk.count('\n')
+        needed = starts[i] + int(characters * 1000 / profile.max_chars_per_second)
+        if needed <= ends[i]:
+            continue
+        following = starts[i + 1] if i + 1 < len(starts) else next_start
+        if following is not None:
+            needed = min(needed, following - MIN_CUE_GAP_MS)
+        new_ends[i] = max(ends[i], needed)
+    return new_ends
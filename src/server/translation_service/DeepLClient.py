@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import deepl.http_client
+from deepl import Translator
+from requests.adapters import HTTPAdapter
+
+# Enough pooled keep-alive connections for every batch worker of every language in flight
+DEEPL_POOL_SIZE = int(os.environ.get("DEEPL_POOL_SIZE", 32))
+DEEPL_USAGE_SYNC_SECONDS = float(os.environ.get("DEEPL_USAGE_SYNC_SECONDS", 300))
+DEEPL_USAGE_WARNING_RATIO = 0.9
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """
+    Returns the process-wide DeepL translator. Its HTTP session is reused by every
+    job, so connections (and their TLS handshakes) are kept alive between requests.
+    """
+    global _translator
+    if _translator is None:
+        with _translator_lock:
+            if _translator is None:
+                # Retries are left to RequestScheduler, which shares its backoff across
+                # jobs and adapts the concurrency; the client's own retries would hide 429s
+                deepl.http_client.max_network_retries = 0
+                translator = Translator(os.environ["DEEPL_AUTH_KEY"])
+                # requests keeps only 10 idle connections per host by default;
+                # concurrent batches beyond that would open and drop connections.
+                session = getattr(getattr(translator, '_client', None), '_session', None)
+                if session is not None:
+                    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=DEEPL_POOL_SIZE))
+                _translator = translator
+    return _translator
+
+
+class UsageLedger:
+    """
+    Local count of DeepL characters billed by this process, reconciled with
+    DeepL's get_usage() from a background timer instead of before every job.
+    """
+
+    def __init__(self, sync_seconds=DEEPL_USAGE_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.count = 0
+        self.limit = None
+        self.synced_at = None
+        self._fetch_usage = None
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, characters):
+        """Adds characters sent for translation since the last reconcile."""
+        with self._lock:
+            self.count += characters
+
+    def reconcile(self):
+        """Replaces the local count with the backend's authoritative usage."""
+        count, limit = self._fetch_usage()
+        with self._lock:
+            self.count = count
+            self.limit = limit
+            self.synced_at = time.time()
+
+    def start(self, fetch_usage):
+        """
+        Reconciles once, synchronously, then keeps reconciling every sync_seconds.
+
+        Args:
+            fetch_usage (callable): Returns (characters used, character limit),
+                e.g. TranslatorBackend.get_usage.
+        """
+        with self._lock:
+            self._fetch_usage = fetch_usage
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(target=self._run, name="deepl-usage-sync", daemon=True)
+            self._timer.start()
+        self.reconcile()
+
+    def _run(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Warning: failed to reconcile DeepL usage: {str(e)}")
+
+    def remaining(self):
+        """Characters left before the limit, or None if the limit is not known yet."""
+        with self._lock:
+            if self.limit is None:
+                return None
+            return self.limit - self.count
+
+    def usage_ratio(self):
+        with self._lock:
+            if not self.limit:
+                return 0.0
+            return self.count / self.limit
+
+
+_usage_ledger = UsageLedger()
+
+
+def get_usage_ledger():
+    """Returns the process-wide usage ledger."""
+    return _usage_ledger
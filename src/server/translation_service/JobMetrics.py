@@ -0,0 +1,74 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class JobMetrics:
+    """
+    Stage timers and counters collected while one translation job runs.
+
+    Stages that run more than once (e.g. one translate call per batch group)
+    accumulate their wall time. Safe to update from several threads.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        """Times the wrapped block as the given stage."""
+        with timed([self], name):
+            yield
+
+    def merge(self, other, counters=True):
+        """
+        Adds another JobMetrics' stages (and counters) to this one, for work done once
+        on behalf of several jobs. Leave counters out on all but one of them so totals
+        such as DeepL requests are not counted twice.
+        """
+        snapshot = other.as_dict()
+        for name, seconds in snapshot["stages"].items():
+            self.add_stage(name, seconds)
+        if counters:
+            for name, amount in snapshot["counters"].items():
+                self.incr(name, amount)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+@contextmanager
+def timed(metrics, name):
+    """
+    Times the wrapped block once and records it as a stage on every JobMetrics in metrics.
+    Work shared by several jobs (parsing one file for many languages) is charged to each of them.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for job_metrics in metrics:
+            if job_metrics is not None:
+                job_metrics.add_stage(name, elapsed)
+
+
+def incr_all(metrics, name, amount=1):
+    """Increments a counter on every JobMetrics in metrics."""
+    for job_metrics in metrics:
+        if job_metrics is not None:
+            job_metrics.incr(name, amount)
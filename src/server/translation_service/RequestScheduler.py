@@ -0,0 +1,389 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+try:
+    import httpx
+except ImportError:  # only raised by AsyncDeepLBackend
+    httpx = None
+
+try:
+    from deepl.exceptions import DeepLException, ConnectionException, TooManyRequestsException, QuotaExceededException
+except ImportError:
+    DeepLException = ConnectionException = TooManyRequestsException = QuotaExceededException = None
+
+# Sustained rates allowed by the DeepL plan; 0 disables a limit. Bursts up to one second's worth.
+DEEPL_MAX_REQUESTS_PER_SECOND = float(os.environ.get("DEEPL_MAX_REQUESTS_PER_SECOND", 20))
+DEEPL_MAX_CHARACTERS_PER_SECOND = float(os.environ.get("DEEPL_MAX_CHARACTERS_PER_SECOND", 0))
+# Requests in flight float between these bounds, starting at the initial value
+DEEPL_MIN_CONCURRENCY = int(os.environ.get("DEEPL_MIN_CONCURRENCY", 1))
+DEEPL_INITIAL_CONCURRENCY = int(os.environ.get("DEEPL_INITIAL_CONCURRENCY", 8))
+DEEPL_MAX_CONCURRENCY = int(os.environ.get("DEEPL_MAX_CONCURRENCY", 64))
+# Recent latency per character above this multiple of the long-run average counts as congestion
+DEEPL_LATENCY_TOLERANCE = float(os.environ.get("DEEPL_LATENCY_TOLERANCE", 2.0))
+# Weight of each request in the recent latency and in the long-run baseline (moving averages)
+DEEPL_LATENCY_SMOOTHING = float(os.environ.get("DEEPL_LATENCY_SMOOTHING", 0.2))
+DEEPL_LATENCY_BASELINE_SMOOTHING = float(os.environ.get("DEEPL_LATENCY_BASELINE_SMOOTHING", 0.01))
+# Consecutive congested requests needed before the limit is halved
+DEEPL_LATENCY_BREACHES = int(os.environ.get("DEEPL_LATENCY_BREACHES", 5))
+DEEPL_MAX_RETRIES = int(os.environ.get("DEEPL_MAX_RETRIES", 6))
+DEEPL_RETRY_BASE_SECONDS = float(os.environ.get("DEEPL_RETRY_BASE_SECONDS", 0.5))
+DEEPL_RETRY_MAX_SECONDS = float(os.environ.get("DEEPL_RETRY_MAX_SECONDS", 60))
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504, 529)
+# Latencies of tiny requests are dominated by the round trip, not the text
+MIN_LATENCY_CHARACTERS = 1000
+# Jitter below this is never read as congestion
+MIN_LATENCY_SECONDS = 0.05
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at rate tokens per second up to capacity.
+
+    reserve takes tokens immediately and may leave the bucket in debt, returning
+    how long the caller must wait before using them; later callers queue behind
+    that debt, so waiting is first come, first served.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Returns the seconds to wait before amount tokens are available; 0 when rate is 0 (unlimited)."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on requests in flight, usable from threads and from event loops.
+
+    Latency is tracked per character of successful requests as two exponentially
+    weighted averages: a recent one and a slow baseline, which follows a service
+    that got slower for good. Every successful request grows the limit by
+    1/limit (about +1 per round trip of the whole window) while the average
+    stays within latency_tolerance of the baseline. A rate-limit response
+    halves the limit right away; latency only does after latency_breaches
+    consecutive requests found the average above tolerance, so one slow
+    response or a jittery local round trip is never read as congestion.
+    Waiters are woken in arrival order: threads through an Event, coroutines
+    through a future resolved on their own loop.
+    """
+
+    def __init__(self, initial=DEEPL_INITIAL_CONCURRENCY, minimum=DEEPL_MIN_CONCURRENCY,
+                 maximum=DEEPL_MAX_CONCURRENCY, latency_tolerance=DEEPL_LATENCY_TOLERANCE,
+                 latency_smoothing=DEEPL_LATENCY_SMOOTHING,
+                 baseline_smoothing=DEEPL_LATENCY_BASELINE_SMOOTHING, latency_breaches=DEEPL_LATENCY_BREACHES):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.baseline_smoothing = baseline_smoothing
+        self.latency_breaches = max(1, latency_breaches)
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._recent = None
+        self._baseline = None
+        self._breaches = 0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self):
+        """Blocks the calling thread until a request slot is free."""
+        with self._lock:
+            if self._in_flight < int(self._limit) and not self._waiters:
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        # release hands the slot over before setting the event
+        event.wait()
+
+    async def acquire_async(self):
+        """Waits on the running event loop until a request slot is free."""
+        with self._lock:
+            if self._in_flight < int(self._limit) and not self._waiters:
+                self._in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            # Cancelled after the slot was handed over: give it back
+            self.release()
+            raise
+
+    def release(self, started=None, characters=0, throttled=False, succeeded=False):
+        """
+        Frees a slot and adjusts the limit.
+
+        Args:
+            started (float optional): time.monotonic() when the request was sent.
+            characters (int optional): Characters the request sent.
+            throttled (bool optional): The service answered with a rate-limit status.
+            succeeded (bool optional): The request succeeded, so its latency is a congestion signal.
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if throttled:
+                self._decrease(started, "rate limited")
+            elif succeeded and started is not None:
+                latency = time.monotonic() - started
+                per_character = max(latency, MIN_LATENCY_SECONDS) / max(characters, MIN_LATENCY_CHARACTERS)
+                if self._congested(per_character):
+                    self._breaches += 1
+                    if self._breaches >= self.latency_breaches:
+                        self._breaches = 0
+                        self._decrease(started, "latency above tolerance")
+                else:
+                    self._breaches = 0
+                    self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._wake()
+
+    def _congested(self, per_character):
+        # Called with the lock held
+        if self._baseline is None:
+            self._recent = self._baseline = per_character
+            return False
+        self._recent += (per_character - self._recent) * self.latency_smoothing
+        self._baseline += (per_character - self._baseline) * self.baseline_smoothing
+        return self._recent > self._baseline * self.latency_tolerance
+
+    def _decrease(self, started, reason):
+        # Requests sent before the last decrease saw the old limit; halve once per window
+        if started is not None and started < self._decreased_at:
+            return
+        self._decreased_at = time.monotonic()
+        previous = int(self._limit)
+        self._limit = max(self.minimum, self._limit / 2)
+        if int(self._limit) != previous:
+            print(f"DeepL concurrency reduced from {previous} to {int(self._limit)} ({reason})")
+
+    def _wake(self):
+        # Called with the lock held
+        while self._waiters and self._in_flight < int(self._limit):
+            waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                self._in_flight += 1
+                waiter.set()
+                continue
+            loop, future = waiter
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiter's loop is closed; it will never take the slot
+                continue
+            self._in_flight += 1
+
+
+def _resolve(future):
+    # A waiter cancelled after it was handed the slot gives it back in acquire_async
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestScheduler:
+    """
+    Shared gate for every request to the translation service.
+
+    Each request waits for a concurrency slot and for request and character
+    tokens, then runs. Failures that are worth retrying (rate limits, 5xx,
+    connection errors) are retried with full-jitter exponential backoff, or
+    after the server's Retry-After when it sends one. A Retry-After also pauses
+    every other request until that time and a rate-limit response halves the
+    concurrency, so the whole process backs off together instead of each job
+    hammering the service.
+    """
+
+    def __init__(self, requests_per_second=DEEPL_MAX_REQUESTS_PER_SECOND,
+                 characters_per_second=DEEPL_MAX_CHARACTERS_PER_SECOND, concurrency=None,
+                 max_retries=DEEPL_MAX_RETRIES, retry_base_seconds=DEEPL_RETRY_BASE_SECONDS,
+                 retry_max_seconds=DEEPL_RETRY_MAX_SECONDS):
+        self.requests = TokenBucket(requests_per_second)
+        self.characters = TokenBucket(characters_per_second)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimit()
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+
+    def snapshot(self):
+        """Returns the request, retry and rate-limit counts so far and the current concurrency, for /metrics."""
+        with self._lock:
+            snapshot = dict(self.stats)
+        snapshot["concurrency_limit"] = self.concurrency.limit
+        snapshot["in_flight"] = self.concurrency.in_flight
+        return snapshot
+
+    def call(self, function, characters=0):
+        """
+        Runs function() under the limits, retrying it when it fails transiently.
+
+        Args:
+            function (callable): Makes one request and returns its result.
+            characters (int optional): Characters the request sends, charged to the character bucket.
+        Returns:
+            The result of function.
+        """
+        attempt = 0
+        while True:
+            self.concurrency.acquire()
+            time.sleep(self._admission_delay(characters))
+            started = time.monotonic()
+            try:
+                result = function()
+            except Exception as e:
+                delay = self._failed(e, attempt, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.concurrency.release(started, characters, succeeded=True)
+            return result
+
+    async def call_async(self, function, characters=0):
+        """Same as call for a coroutine function, waiting on the running event loop."""
+        attempt = 0
+        while True:
+            await self.concurrency.acquire_async()
+            try:
+                await asyncio.sleep(self._admission_delay(characters))
+            except asyncio.CancelledError:
+                self.concurrency.release()
+                raise
+            started = time.monotonic()
+            try:
+                result = await function()
+            except asyncio.CancelledError:
+                self.concurrency.release()
+                raise
+            except Exception as e:
+                delay = self._failed(e, attempt, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.concurrency.release(started, characters, succeeded=True)
+            return result
+
+    def _admission_delay(self, characters):
+        with self._lock:
+            self.stats["requests"] += 1
+            paused = max(0.0, self._paused_until - time.monotonic())
+        # Both buckets are charged now; the request waits for whichever refills last
+        return max(paused, self.requests.reserve(1), self.characters.reserve(characters) if characters else 0.0)
+
+    def _failed(self, error, attempt, started):
+        """Releases the slot of a failed request and returns the seconds to wait before retrying, or None."""
+        status_code, retry_after = describe_error(error)
+        throttled = status_code == 429 or (status_code == 456 and retry_after is not None)
+        self.concurrency.release(started, throttled=throttled)
+        # 456 means the character quota is used up, which only a Retry-After says will change
+        retryable = throttled or status_code in RETRYABLE_STATUS_CODES or (status_code is None and _is_connection_error(error))
+        if not retryable or attempt >= self.max_retries:
+            return None
+
+        backoff = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt)
+        if retry_after is not None:
+            delay = min(self.retry_max_seconds, retry_after) + random.uniform(0, self.retry_base_seconds)
+        else:
+            delay = random.uniform(0, backoff)
+        with self._lock:
+            self.stats["retries"] += 1
+            if throttled:
+                self.stats["throttled"] += 1
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + min(self.retry_max_seconds, retry_after))
+        print(f"DeepL request failed ({status_code or type(error).__name__}), "
+              f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+
+def describe_error(error):
+    """
+    Extracts what the retry policy needs from a failed request.
+
+    Returns:
+        tuple: (HTTP status code or None, Retry-After in seconds or None)
+    """
+    if httpx is not None and isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code, parse_retry_after(error.response.headers.get("Retry-After"))
+    if DeepLException is not None and isinstance(error, DeepLException):
+        status_code = error.http_status_code
+        if status_code is None and isinstance(error, TooManyRequestsException):
+            status_code = 429
+        elif status_code is None and isinstance(error, QuotaExceededException):
+            status_code = 456
+        # The deepl package does not expose response headers
+        return status_code, None
+    return getattr(error, "status_code", None), parse_retry_after(getattr(error, "retry_after", None))
+
+
+def parse_retry_after(value):
+    """Converts a Retry-After header (seconds or an HTTP date) into seconds from now."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_connection_error(error):
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    if ConnectionException is not None and isinstance(error, ConnectionException):
+        return error.should_retry
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler():
+    """Returns the process-wide scheduler shared by every DeepL backend and job."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
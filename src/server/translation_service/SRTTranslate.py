@@ -1,10 +1,27 @@
+import codecs
+import difflib
 import os
+import threading
 import pysrt
 import xml.etree.ElementTree as ET
-from deepl import Translator
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from .TargetLanguage import TargetLanguage
+from .DeepLClient import get_usage_ledger, DEEPL_USAGE_WARNING_RATIO
+from .TranslatorBackend import get_backend
+from .TranslationMemory import get_translation_memory, normalize_sentence
+from .JobMetrics import JobMetrics, timed, incr_all
+from .CueRedistribution import get_redistribution_profile, split_by_duration, extend_for_reading_speed
 
-def srt_translate(srt_file: str, target_lang: TargetLanguage):
+# DeepL rejects request bodies above 128 KiB; leave headroom for the form encoding.
+DEEPL_MAX_CHUNK_BYTES = int(os.environ.get("DEEPL_MAX_CHUNK_BYTES", 60 * 1024))
+DEEPL_MAX_WORKERS = int(os.environ.get("DEEPL_MAX_WORKERS", 4))
+DEEPL_FORMALITY = "prefer_less"
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+_XML_WRAPPER_BYTES = len(f"{XML_DECLARATION}\n<subtitles>\n</subtitles>".encode('utf-8'))
+
+def srt_translate(srt_file: str, target_lang: TargetLanguage, backend=None, translation_memory=None):
     """
     Takes the srt file and breaks it into sentences,
     maps the sentences to the range of timestamps and reverse indexes,
@@ -14,27 +31,435 @@ def srt_translate(srt_file: str, target_lang: TargetLanguage):
     Args:
         srt_file (str): Path to the original SRT file.
         target_lang (str): The target language code (e.g. 'JA' for Japanese).
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        translation_memory (TranslationMemory optional): Cache to consult, defaults to the shared one.
 
     Returns:
         list: A list of translated sentences with their original timestamps.
     """
+    errors = {}
+    results = srt_translate_many(srt_file, [target_lang], errors, backend, translation_memory)
+    if target_lang in errors:
+        raise errors[target_lang]
+    return results[target_lang]
+
+
+def srt_translate_many(srt_file: str, target_langs, errors=None, backend=None, translation_memory=None,
+                       metrics=None, checkpoints=None, progress=None):
+    """
+    Translates one srt file into several languages. The quota check, parsing,
+    sentence segmentation and XML element building happen once and are shared;
+    only the translate and map stages run per language, concurrently.
+
+    Args:
+        srt_file (str): Path to the original SRT file.
+        target_langs (list): The target languages.
+        errors (dict optional): Filled with the SRTTranslationError of every language that failed.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        translation_memory (TranslationMemory optional): Cache to consult, defaults to the shared one.
+        metrics (dict optional): JobMetrics per target language. Shared stages are
+            charged to every language, per-language stages only to their own.
+        checkpoints (dict optional): Job checkpoint per target language, see translate_sentences.
+        progress (dict optional): on_progress callback per target language, see translate_sentences.
+
+    Returns:
+        dict: Mapping of each successfully translated language to its list of
+              translated subtitles with their original timestamps.
+    """
+    if backend is None:
+        backend = get_backend()
+    if metrics is None:
+        metrics = {}
+    if checkpoints is None:
+        checkpoints = {}
+    if progress is None:
+        progress = {}
+    shared_metrics = [metrics.get(target_lang) for target_lang in target_langs]
     try:
-        check_deepl_quota()
-        subs = validate_srt_file(srt_file)
-        print(f"Translating {len(subs)} subtitles from {srt_file} to {target_lang}")
+        with timed(shared_metrics, "quota"):
+            check_deepl_quota(backend)
+        # Cues are parsed lazily and segmented as they stream in, so the
+        # whole SubRipFile is never held in memory
+        cue_count = 0
 
-        sentences = break_into_sentences(subs)
-        translated_sentences = translate_sentences(sentences, target_lang)
-        translated_subs = map_sentences_back_split(sentences, translated_sentences)
+        def counted(cues):
+            nonlocal cue_count
+            for cue in cues:
+                cue_count += 1
+                yield cue
 
-        return translated_subs
+        with timed(shared_metrics, "parse_segment"):
+            sentences = break_into_sentences(counted(iter_srt_cues(srt_file)))
+        if cue_count == 0:
+            raise SRTTranslationError(f"SRT file is empty: {srt_file}")
+        print(f"Translating {cue_count} subtitles from {srt_file} to {', '.join(str(lang) for lang in target_langs)}")
+
+        with timed(shared_metrics, "build_xml"):
+            elements = build_subtitle_elements(sentences)
+        incr_all(shared_metrics, "cues", cue_count)
+        incr_all(shared_metrics, "sentences", len(sentences))
     except SRTTranslationError as e:
         print(f"Translation error: {str(e)}")
         raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         raise SRTTranslationError(f"Translation failed: {str(e)}")
-   
+
+    def translate_language(target_lang):
+        language_metrics = metrics.get(target_lang)
+        translated_sentences = translate_sentences(
+            sentences, target_lang, translation_memory=translation_memory, elements=elements, backend=backend,
+            metrics=language_metrics, checkpoint=checkpoints.get(target_lang), on_progress=progress.get(target_lang)
+        )
+        diagnostics = {}
+        with timed([language_metrics], "map"):
+            mapped = map_sentences_back_split(sentences, translated_sentences, diagnostics, target_lang)
+        record_mapping_diagnostics(language_metrics, diagnostics, f"{srt_file} to {target_lang}")
+        return mapped
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(target_langs), 1)) as executor:
+        futures = {target_lang: executor.submit(translate_language, target_lang) for target_lang in target_langs}
+        for target_lang, future in futures.items():
+            try:
+                results[target_lang] = future.result()
+            except Exception as e:
+                print(f"Translation to {target_lang} failed: {str(e)}")
+                if errors is not None:
+                    errors[target_lang] = e if isinstance(e, SRTTranslationError) else SRTTranslationError(f"Translation failed: {str(e)}")
+    return results
+
+
+def srt_translate_files(srt_files, target_langs, errors=None, backend=None, translation_memory=None,
+                        metrics=None, progress=None, pairs=None):
+    """
+    Translates several srt files into several languages, packing the sentences of
+    all files into shared DeepL requests. Meant for batches of small files (a
+    season of episodes), which would otherwise cost at least one mostly empty
+    request per file and language.
+
+    Args:
+        srt_files (list): Paths of the original SRT files.
+        target_langs (list): The target languages.
+        pairs (set optional): The (srt_file, target_lang) pairs to translate, when not
+            every file is wanted in every language. Defaults to all of them.
+        errors (dict optional): Filled with the SRTTranslationError of every (srt_file, target_lang) that failed.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        translation_memory (TranslationMemory optional): Cache to consult, defaults to the shared one.
+        metrics (dict optional): JobMetrics per (srt_file, target_lang). Stages of the shared
+            requests are charged to every file, their counters only to the first one.
+        progress (dict optional): on_progress callback per target language, see translate_sentences.
+
+    Returns:
+        dict: Mapping of each successfully translated (srt_file, target_lang) to its list
+              of translated subtitles with their original timestamps.
+    """
+    if backend is None:
+        backend = get_backend()
+    if errors is None:
+        errors = {}
+    if metrics is None:
+        metrics = {}
+    if progress is None:
+        progress = {}
+    if pairs is None:
+        pairs = {(srt_file, target_lang) for srt_file in srt_files for target_lang in target_langs}
+    srt_files = [srt_file for srt_file in srt_files if any((srt_file, lang) in pairs for lang in target_langs)]
+    target_langs = [lang for lang in target_langs if any((srt_file, lang) in pairs for srt_file in srt_files)]
+
+    def fail(srt_file, e):
+        print(f"Translation of {srt_file} failed: {str(e)}")
+        for target_lang in target_langs:
+            if (srt_file, target_lang) in pairs:
+                errors[(srt_file, target_lang)] = e if isinstance(e, SRTTranslationError) else SRTTranslationError(f"Translation failed: {str(e)}")
+
+    try:
+        with timed(metrics.values(), "quota"):
+            check_deepl_quota(backend)
+    except Exception as e:
+        for srt_file in srt_files:
+            fail(srt_file, e)
+        return {}
+
+    # Sentence ids must be unique across the packed files, so each file's cues are renumbered
+    file_sentences = {}
+    offset = 0
+    for srt_file in srt_files:
+        file_metrics = [metrics.get((srt_file, target_lang)) for target_lang in target_langs
+                        if (srt_file, target_lang) in pairs]
+        try:
+            with timed(file_metrics, "parse_segment"):
+                sentences = renumber_sentences(break_into_sentences(iter_srt_cues(srt_file)), offset)
+            if not sentences:
+                raise SRTTranslationError(f"SRT file is empty: {srt_file}")
+        except Exception as e:
+            fail(srt_file, e)
+            continue
+        cue_count = sum(sentence.cue_count for sentence in sentences)
+        offset += cue_count
+        incr_all(file_metrics, "cues", cue_count)
+        incr_all(file_metrics, "sentences", len(sentences))
+        file_sentences[srt_file] = sentences
+    if not file_sentences:
+        return {}
+
+    # Languages wanted for the same files share one packed request body
+    language_files = {}
+    for target_lang in target_langs:
+        language_files[target_lang] = tuple(srt_file for srt_file in file_sentences if (srt_file, target_lang) in pairs)
+    packed_elements = {}
+    for files in set(language_files.values()):
+        if not files:
+            continue
+        packed = [sentence for srt_file in files for sentence in file_sentences[srt_file]]
+        build_metrics = JobMetrics()
+        with timed([build_metrics], "build_xml"):
+            packed_elements[files] = (packed, build_subtitle_elements(packed), build_metrics)
+        print(f"Translating {len(files)} files ({len(packed)} sentences) to "
+              f"{', '.join(str(lang) for lang in target_langs if language_files[lang] == files)}")
+
+    def translate_language(target_lang):
+        files = language_files[target_lang]
+        if not files:
+            return {}
+        packed, elements, build_metrics = packed_elements[files]
+        language_metrics = JobMetrics()
+        translated_sentences = translate_sentences(
+            packed, target_lang, translation_memory=translation_memory, elements=elements, backend=backend,
+            metrics=language_metrics, on_progress=progress.get(target_lang)
+        )
+        missing_ids = {srt_file: [] for srt_file in files}
+        with timed([language_metrics], "map"):
+            subtitle_index, duplicate_ids = index_subtitle_elements(ET.fromstring(translated_sentences))
+            mapped = {
+                srt_file: list(iter_mapped_subtitles(file_sentences[srt_file], subtitle_index, missing_ids[srt_file],
+                                                     target_lang))
+                for srt_file in files
+            }
+        # Duplicates belong to the shared requests, missing sentences to their own file
+        record_mapping_diagnostics(language_metrics, {'duplicate_ids': duplicate_ids},
+                                   f"{len(files)} packed files to {target_lang}")
+        language_metrics.merge(build_metrics)
+        for position, srt_file in enumerate(files):
+            file_metrics = metrics.get((srt_file, target_lang))
+            if file_metrics is not None:
+                file_metrics.merge(language_metrics, counters=position == 0)
+            record_mapping_diagnostics(file_metrics, {'missing_ids': missing_ids[srt_file]},
+                                       f"{srt_file} to {target_lang}")
+        return mapped
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(target_langs), 1)) as executor:
+        futures = {target_lang: executor.submit(translate_language, target_lang) for target_lang in target_langs}
+        for target_lang, future in futures.items():
+            try:
+                for srt_file, mapped in future.result().items():
+                    results[(srt_file, target_lang)] = mapped
+            except Exception as e:
+                print(f"Translation to {target_lang} failed: {str(e)}")
+                for srt_file in language_files[target_lang]:
+                    errors[(srt_file, target_lang)] = e if isinstance(e, SRTTranslationError) else SRTTranslationError(f"Translation failed: {str(e)}")
+    return results
+
+
+def srt_translate_incremental(srt_file: str, target_lang: TargetLanguage, previous_srt_file: str,
+                              previous_translated_file: str, backend=None, translation_memory=None, metrics=None):
+    """
+    Re-translates a revised srt file, paying only for the sentences that changed.
+
+    Both versions are segmented with break_into_sentences and their sentences are
+    diffed. Sentences that are unchanged (same text over the same number of cues)
+    keep their previous translation, re-timed to the new cues; only the changed
+    sentence windows are sent to DeepL and spliced in between.
+
+    Args:
+        srt_file (str): Path to the revised SRT file.
+        target_lang (str): The target language code (e.g. 'JA' for Japanese).
+        previous_srt_file (str): Path to the SRT file the previous job translated.
+        previous_translated_file (str): Path to the previous job's translated SRT file.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        translation_memory (TranslationMemory optional): Cache to consult, defaults to the shared one.
+        metrics (JobMetrics optional): Receives stage timings and counters.
+
+    Returns:
+        list: A list of translated sentences with their original timestamps.
+    """
+    try:
+        with timed([metrics], "parse_segment"):
+            previous_sentences = break_into_sentences(iter_srt_cues(previous_srt_file))
+            sentences = break_into_sentences(iter_srt_cues(srt_file))
+            previous_translations = [cue.text for cue in iter_srt_cues(previous_translated_file)]
+        if not sentences:
+            raise SRTTranslationError(f"SRT file is empty: {srt_file}")
+
+        # The previous output has one cue per source cue, in sentence order, unless
+        # some sentence came back untranslated; then nothing can be reused safely.
+        previous_chunks = []
+        if len(previous_translations) == sum(sentence.cue_count for sentence in previous_sentences):
+            position = 0
+            for sentence in previous_sentences:
+                previous_chunks.append(previous_translations[position:position + sentence.cue_count])
+                position += sentence.cue_count
+        else:
+            previous_sentences = []
+
+        def signature(sentence):
+            return normalize_sentence(sentence.text), sentence.cue_count
+
+        matcher = difflib.SequenceMatcher(
+            None, [signature(sentence) for sentence in previous_sentences],
+            [signature(sentence) for sentence in sentences], autojunk=False
+        )
+        opcodes = matcher.get_opcodes()
+
+        changed = [sentence for tag, _, _, j1, j2 in opcodes if tag != 'equal' for sentence in sentences[j1:j2]]
+        incr_all([metrics], "sentences", len(sentences))
+        incr_all([metrics], "sentences_retranslated", len(changed))
+        incr_all([metrics], "sentences_reused", len(sentences) - len(changed))
+        print(f"Re-translating {len(changed)} of {len(sentences)} sentences from {srt_file} to {target_lang}")
+
+        translated_changed = iter([])
+        if changed:
+            translated_xml = translate_sentences(
+                changed, target_lang, translation_memory=translation_memory, backend=backend, metrics=metrics
+            )
+            diagnostics = {}
+            with timed([metrics], "map"):
+                translated_changed = iter(list(
+                    iter_sentence_chunks(changed, translated_xml, target_lang, diagnostics)
+                ))
+            record_mapping_diagnostics(metrics, diagnostics, f"{srt_file} to {target_lang}")
+
+        # Reused chunks are re-timed like fresh ones, reading-speed extension included
+        profile = get_redistribution_profile(target_lang)
+        mapped_results = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                for previous_index, sentence in zip(range(i1, i2), sentences[j1:j2]):
+                    mapped_results.extend(_iter_timed_chunks(sentence, previous_chunks[previous_index], profile))
+            else:
+                for _ in sentences[j1:j2]:
+                    mapped_results.extend(next(translated_changed))
+        return mapped_results
+    except SRTTranslationError as e:
+        print(f"Translation error: {str(e)}")
+        raise
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        raise SRTTranslationError(f"Translation failed: {str(e)}")
+
+
+def save_translated_subtitles(translated_subs, output_path):
+    """
+    Writes the mapped subtitles produced by map_sentences_back_split to an SRT file.
+
+    Args:
+        translated_subs (list): Dicts with 'text', 'start_time' and 'end_time'.
+        output_path (str): Destination path of the translated SRT file.
+    """
+    items = [
+        pysrt.SubRipItem(index=index, start=sub['start_time'], end=sub['end_time'], text=sub['text'])
+        for index, sub in enumerate(translated_subs, start=1)
+    ]
+    pysrt.SubRipFile(items=items).save(output_path, encoding='utf-8')
+
+
+# Common abbreviations that contain periods but don't end sentences
+SENTENCE_ABBREVIATIONS = (
+    'etc.', 'e.g.', 'i.e.', 'vs.', 'Mr.', 'Mrs.', 'Ms.', 'Dr.', 'Prof.',
+    'Sr.', 'Jr.', 'Co.', 'Ltd.', 'Inc.', 'St.', 'Ave.', 'Ph.D.', 'U.S.',
+    'U.K.', 'a.m.', 'p.m.', 'vol.', 'rev.', 'no.', 'p.', 'pp.'
+)
+# Sentence end markers; '...' is covered by '.'
+SENTENCE_ENDS = ('.', '!', '?', '…')
+_LEADING_ELLIPSES = ('...', '…')
+
+
+class _CueTable:
+    """Subtitle index, start and end (milliseconds) of every cue, shared by the sentences of one file."""
+    __slots__ = ('indices', 'starts', 'ends')
+
+    def __init__(self):
+        self.indices = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+
+
+class Sentence:
+    """
+    A sentence and the run of cues it spans.
+
+    The cues live in a _CueTable shared with the other sentences of the file, so a
+    sentence costs one small object rather than a dict of lists of pysrt times.
+    Item access ('text', 'indices', 'timestamps') is kept for dict-style callers.
+    """
+    __slots__ = ('text', '_cues', '_first', '_stop')
+
+    def __init__(self, text, cues, first, stop):
+        self.text = text
+        self._cues = cues
+        self._first = first
+        self._stop = stop
+
+    @property
+    def cue_count(self):
+        return self._stop - self._first
+
+    @property
+    def first_index(self):
+        """Subtitle index of the first cue, used as the sentence id in the DeepL XML."""
+        return self._cues.indices[self._first]
+
+    @property
+    def indices(self):
+        return self._cues.indices[self._first:self._stop]
+
+    @property
+    def start_ms(self):
+        return self._cues.starts[self._first:self._stop]
+
+    @property
+    def end_ms(self):
+        return self._cues.ends[self._first:self._stop]
+
+    @property
+    def next_start_ms(self):
+        """Start of the cue following the sentence, None at the end of the file."""
+        if self._stop < len(self._cues.starts):
+            return self._cues.starts[self._stop]
+        return None
+
+    @property
+    def timestamps(self):
+        """(start, end) pysrt.SubRipTime of each cue."""
+        return [
+            (pysrt.SubRipTime.from_ordinal(start), pysrt.SubRipTime.from_ordinal(end))
+            for start, end in zip(self.start_ms, self.end_ms)
+        ]
+
+    def __getitem__(self, key):
+        if key not in ('text', 'indices', 'timestamps'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"Sentence({self.text!r}, indices={list(self.indices)!r})"
+
+
+def renumber_sentences(sentences, offset):
+    """
+    Copies sentences of one file with their cues renumbered offset + 1, offset + 2, ...
+    so sentences of several files can share one XML document without id clashes.
+    Timing is kept, including the following cue used for reading speed.
+    """
+    if not sentences:
+        return []
+    source = sentences[0]._cues
+    cues = _CueTable()
+    cues.indices = array('q', range(offset + 1, offset + len(source.starts) + 1))
+    cues.starts = source.starts
+    cues.ends = source.ends
+    return [Sentence(sentence.text, cues, sentence._first, sentence._stop) for sentence in sentences]
 
 
 def break_into_sentences(subs):
@@ -42,113 +467,289 @@ def break_into_sentences(subs):
     Breaks SRT subtitles into complete sentences, accounting for common abbreviations.
     
     Args:
-        subs: pysrt subtitles object.
+        subs: pysrt subtitles object, or any iterable of pysrt.SubRipItem.
     Returns:
-        list: List of dicts containing:
+        list: List of Sentence, each with:
               - text: concatenated sentence text.
-              - indices: list of subtitle indices included in the sentence.
+              - indices: subtitle indices included in the sentence.
               - timestamps: list of (start, end) tuples for each subtitle.
     """
-    # Common abbreviations that contain periods but don't end sentences
-    abbreviations = {
-        'etc.', 'e.g.', 'i.e.', 'vs.', 'Mr.', 'Mrs.', 'Ms.', 'Dr.', 'Prof.',
-        'Sr.', 'Jr.', 'Co.', 'Ltd.', 'Inc.', 'St.', 'Ave.', 'Ph.D.', 'U.S.',
-        'U.K.', 'a.m.', 'p.m.', 'vol.', 'rev.', 'no.', 'p.', 'pp.'
-    }
-    
-    # Add sentence end markers
-    sentence_ends = ('.', '!', '?', '...', '…')
-    
+    cues = _CueTable()
+    indices_append = cues.indices.append
+    starts_append = cues.starts.append
+    ends_append = cues.ends.append
+
     sentences = []
-    current_sentence = {
-        'text': '',
-        'indices': [],
-        'timestamps': []
-    }
-    
+    parts = []
+    first = 0
     for sub in subs:
         text = sub.text.strip()
-        
+
         # Skip empty subtitles
         if not text:
             continue
-            
-        if not current_sentence['indices']:
-            current_sentence['indices'].append(sub.index)
-            current_sentence['timestamps'].append((sub.start, sub.end))
-        else:
-            current_sentence['indices'].append(sub.index)
-            current_sentence['timestamps'].append((sub.start, sub.end))
-        
+
+        try:
+            indices_append(sub.index)
+        except TypeError:
+            # pysrt keeps indices it cannot parse as int (or None); fall back to a list
+            cues.indices = list(cues.indices)
+            indices_append = cues.indices.append
+            indices_append(sub.index)
+        starts_append(sub.start.ordinal)
+        ends_append(sub.end.ordinal)
+
         # Handle ellipsis at start of text
-        if text.startswith(('...', '…')) and current_sentence['text']:
-            current_sentence['text'] = current_sentence['text'].rstrip() + '...'
-        
-        current_sentence['text'] += ' ' + text
-        
-        # Check for sentence end
-        is_abbreviation = any(text.endswith(abbr) for abbr in abbreviations)
-        ends_with_sentence = any(text.endswith(end) for end in sentence_ends)
-        
-        if ends_with_sentence and not is_abbreviation:
-            # Handle quoted sentences
-            if text.count('"') % 2 == 0:  # Even number of quotes
-                current_sentence['text'] = current_sentence['text'].strip()
-                sentences.append(current_sentence)
-                current_sentence = {
-                    'text': '',
-                    'indices': [],
-                    'timestamps': []
-                }
-            
-    if current_sentence['text']:
-        current_sentence['text'] = current_sentence['text'].strip()
-        sentences.append(current_sentence)
-        
+        if parts and text.startswith(_LEADING_ELLIPSES):
+            parts[-1] += '...'
+        parts.append(text)
+
+        # Check for sentence end; handle quoted sentences by requiring an even number of quotes
+        if (text.endswith(SENTENCE_ENDS) and not text.endswith(SENTENCE_ABBREVIATIONS)
+                and text.count('"') % 2 == 0):
+            stop = len(cues.starts)
+            sentences.append(Sentence(' '.join(parts), cues, first, stop))
+            parts = []
+            first = stop
+
+    if parts:
+        sentences.append(Sentence(' '.join(parts), cues, first, len(cues.starts)))
+
     return sentences
 
 
-def translate_sentences(sentences, target_lang):
+def translate_sentences(sentences, target_lang, max_chunk_bytes=None, max_workers=None, translation_memory=None,
+                        elements=None, backend=None, metrics=None, checkpoint=None, on_progress=None):
     """
     Translates a list of sentences transformed into xml into a string.
+    Sentences already in the translation memory are served from it; only the
+    misses (each distinct sentence once) are sent to DeepL and then remembered.
     
     Args:
-        sentences (list): List of dicts containing sentence text and timestamp ranges
+        sentences (list): Sentence objects from break_into_sentences
         target_lang (str): The target language code (e.g. 'JA' for Japanese)
+        max_chunk_bytes (int optional): UTF-8 size budget of a single request document.
+        max_workers (int optional): Number of batches translated at the same time.
+        translation_memory (TranslationMemory optional): Cache to consult, defaults to the shared one.
+        elements (list optional): Prebuilt <subtitle> elements aligned with sentences,
+            so several languages can share one build_subtitle_elements pass.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        metrics (JobMetrics optional): Receives stage timings and request counters.
+        checkpoint (optional): Job checkpoint with load() -> list of translated XML documents and
+            save(first_id, last_id, translated_xml). Sentences found in it are not sent again,
+            and every batch is saved to it as soon as DeepL returns it.
+        on_progress (callable optional): Called with (translated, total) distinct sentences
+            once the memory and checkpoint are consulted and after every batch.
 
     Returns:
         text (str): The translated text.
     """
-    # Instantiate the DeepL translator
-    translator = Translator(os.environ["DEEPL_AUTH_KEY"])
+    target_code = getattr(target_lang, 'value', target_lang)
+    if translation_memory is None:
+        translation_memory = get_translation_memory()
 
-    # Build proper XML with root element
-    xml_parts = ['<?xml version="1.0" encoding="UTF-8"?>', "<subtitles>"]
-    
-    # Add each sentence as a subtitle element, escaping special characters
+    texts = [normalize_sentence(sentence.text) for sentence in sentences]
+    with timed([metrics], "translation_memory"):
+        cached = translation_memory.get_many(texts, target_code, DEEPL_FORMALITY)
+
+    # Only sentences missing from the memory go upstream, each distinct text once
+    pending = {}
+    for position, text in enumerate(texts):
+        if text not in cached and text not in pending:
+            pending[text] = position
+
+    translated = {}
+    if pending and checkpoint is not None:
+        # Resume: batches an earlier attempt finished are not paid for again
+        with timed([metrics], "checkpoint"):
+            checkpoint_index = {}
+            for translated_xml in checkpoint.load():
+                checkpoint_index.update(index_subtitle_elements(ET.fromstring(translated_xml))[0])
+        for text, position in list(pending.items()):
+            subtitle_elem = checkpoint_index.get(str(sentences[position].first_index))
+            if subtitle_elem is not None and subtitle_elem.text is not None:
+                translated[text] = subtitle_elem.text
+                del pending[text]
+        incr_all([metrics], "sentences_resumed", len(translated))
+
+    total = len(cached) + len(translated) + len(pending)
+    if on_progress is not None:
+        on_progress(total - len(pending), total)
+
+    if pending:
+        if elements is None:
+            pending_elements = build_subtitle_elements(sentences[position] for position in pending.values())
+        else:
+            pending_elements = [elements[position] for position in pending.values()]
+        translated_xml = send_elements_to_deepl(
+            pending_elements, target_code, max_chunk_bytes, max_workers, backend, metrics,
+            on_batch=_batch_callback(checkpoint, on_progress, total - len(pending), total)
+        )
+        with timed([metrics], "parse_xml"):
+            subtitle_index, _ = index_subtitle_elements(ET.fromstring(translated_xml))
+        for text, position in pending.items():
+            sentence = sentences[position]
+            subtitle_elem = subtitle_index.get(str(sentence.first_index))
+            if subtitle_elem is not None and subtitle_elem.text is not None:
+                translated[text] = subtitle_elem.text
+        with timed([metrics], "translation_memory"):
+            translation_memory.put_many(translated, target_code, DEEPL_FORMALITY)
+        characters_sent = sum(len(text) for text in pending)
+        get_usage_ledger().record(characters_sent)
+        incr_all([metrics], "characters_sent", characters_sent)
+
+    incr_all([metrics], "cache_hits", len(cached))
+    incr_all([metrics], "cache_misses", len(pending))
+
+    # Rebuild the full document so the mapping stage sees every sentence
+    root = ET.Element('subtitles')
+    for sentence, text in zip(sentences, texts):
+        translated_text = cached[text] if text in cached else translated.get(text)
+        if translated_text is None:
+            continue
+        ET.SubElement(root, 'subtitle', id=str(sentence.first_index)).text = translated_text
+    return ET.tostring(root, encoding='unicode')
+
+
+def _batch_callback(checkpoint, on_progress, done, total):
+    """
+    Builds the on_batch callback of send_elements_to_deepl: saves each translated
+    batch to the job checkpoint and reports progress. Batches arrive from several threads.
+    """
+    if checkpoint is None and on_progress is None:
+        return None
+    lock = threading.Lock()
+    state = {'done': done}
+
+    def on_batch(translated_xml):
+        subtitle_ids = [elem.get('id') for elem in ET.fromstring(translated_xml).iter('subtitle')]
+        if checkpoint is not None and subtitle_ids:
+            first_id, last_id = (int(i) if i.isdigit() else None for i in (subtitle_ids[0], subtitle_ids[-1]))
+            checkpoint.save(first_id, last_id, translated_xml)
+        if on_progress is not None:
+            with lock:
+                state['done'] += len(subtitle_ids)
+                done_now = min(state['done'], total)
+            on_progress(done_now, total)
+    return on_batch
+
+
+def send_elements_to_deepl(elements, target_lang, max_chunk_bytes=None, max_workers=None, backend=None,
+                           metrics=None, on_batch=None):
+    """
+    Sends <subtitle> elements to DeepL as sentence-aligned <subtitles> batches that stay
+    under max_chunk_bytes, translates the batches concurrently and stitches the
+    translated batches back together in their original order.
+
+    Args:
+        elements (list): <subtitle> element strings from build_subtitle_elements.
+        target_lang (str): The target language code (e.g. 'JA' for Japanese)
+        max_chunk_bytes (int optional): UTF-8 size budget of a single request document.
+        max_workers (int optional): Number of batches translated at the same time.
+        backend (TranslatorBackend optional): Translation service, defaults to get_backend().
+        metrics (JobMetrics optional): Receives the translate stage time and request/byte counters.
+        on_batch (callable optional): Called with each translated batch document as it arrives.
+
+    Returns:
+        str: The translated XML document.
+    """
+    if max_chunk_bytes is None:
+        max_chunk_bytes = DEEPL_MAX_CHUNK_BYTES
+    if max_workers is None:
+        max_workers = DEEPL_MAX_WORKERS
+
+    if backend is None:
+        backend = get_backend()
+
+    batches = [wrap_subtitles_xml(batch) for batch in batch_subtitle_elements(elements, max_chunk_bytes)]
+    incr_all([metrics], "requests", len(batches))
+    incr_all([metrics], "bytes_sent", sum(len(batch.encode('utf-8')) for batch in batches))
+    with timed([metrics], "translate"):
+        translated_batches = backend.translate_batches(
+            batches, target_lang, DEEPL_FORMALITY, max_workers=max_workers,
+            on_result=(lambda _, translated_xml: on_batch(translated_xml)) if on_batch is not None else None
+        )
+
+    if len(translated_batches) == 1:
+        return translated_batches[0]
+    with timed([metrics], "parse_xml"):
+        return merge_translated_batches(translated_batches)
+
+
+def build_subtitle_elements(sentences):
+    """
+    Builds one escaped <subtitle> element per sentence, keyed by its first subtitle index.
+
+    Args:
+        sentences (iterable): Sentence objects from break_into_sentences.
+    Returns:
+        list: The <subtitle> element strings, in sentence order.
+    """
+    elements = []
     for sentence in sentences:
         # Escape special characters in the text
-        cleaned_text = ' '.join(sentence['text'].split())
+        cleaned_text = normalize_sentence(sentence.text)
         escaped_text = (cleaned_text
             .replace('&', '&amp;')
             .replace('<', '&lt;')
             .replace('>', '&gt;')
             .replace('"', '&quot;')
             .replace("'", '&apos;'))
-        xml_parts.append(f"<subtitle id='{sentence['indices'][0]}'>{escaped_text}</subtitle>")
-    
+        elements.append(f"<subtitle id='{sentence.first_index}'>{escaped_text}</subtitle>")
+    return elements
+
+
+def wrap_subtitles_xml(elements):
+    """
+    Wraps <subtitle> elements into a complete <subtitles> XML document.
+    """
+    xml_parts = [XML_DECLARATION, "<subtitles>"]
+    xml_parts.extend(elements)
     xml_parts.append("</subtitles>")
-    xml_string = "\n".join(xml_parts)
+    return "\n".join(xml_parts)
 
-    # Translate all sentences at once
-    translated_sentences = translator.translate_text(
-        xml_string,
-        target_lang=target_lang,
-        tag_handling="xml",
-        formality="prefer_less"
-    )
 
-    return translated_sentences.text
+def batch_subtitle_elements(elements, max_chunk_bytes):
+    """
+    Greedily packs <subtitle> elements into batches whose wrapped document stays
+    under max_chunk_bytes. A single element larger than the budget gets its own batch.
+
+    Args:
+        elements (list): <subtitle> element strings.
+        max_chunk_bytes (int): UTF-8 size budget of a wrapped batch.
+    Returns:
+        list: List of element lists, preserving order.
+    """
+    batches = []
+    current = []
+    current_size = _XML_WRAPPER_BYTES
+    for element in elements:
+        # +1 for the newline joining the element to the document
+        element_size = len(element.encode('utf-8')) + 1
+        if current and current_size + element_size > max_chunk_bytes:
+            batches.append(current)
+            current = []
+            current_size = _XML_WRAPPER_BYTES
+        current.append(element)
+        current_size += element_size
+    if current or not batches:
+        batches.append(current)
+    return batches
+
+
+def merge_translated_batches(translated_batches):
+    """
+    Concatenates translated <subtitles> documents into a single document.
+
+    Args:
+        translated_batches (list): Translated XML strings, in order.
+    Returns:
+        str: One XML document holding every translated <subtitle> element.
+    """
+    merged = ET.Element('subtitles')
+    for translated_xml in translated_batches:
+        merged.extend(ET.fromstring(translated_xml))
+    return ET.tostring(merged, encoding='unicode')
 
 
 def split_text_into_chunks(text, n_chunks, m_chunks = 1):
@@ -183,81 +784,212 @@ def split_text_into_chunks(text, n_chunks, m_chunks = 1):
     return chunks
 
 
-def map_sentences_back_split(sentences, translated_sentences_xml):
+def index_subtitle_elements(root):
+    """
+    Indexes the <subtitle> children of the translated XML by their id attribute
+    in a single pass, so each sentence lookup is O(1) instead of a full scan.
+
+    Args:
+        root (Element): The parsed <subtitles> root element.
+
+    Returns:
+        tuple: (dict mapping id string to its first <subtitle> element,
+                list of ids that appeared more than once)
+    """
+    index = {}
+    duplicate_ids = []
+    for elem in root.iter('subtitle'):
+        elem_id = elem.get('id')
+        if elem_id is None:
+            continue
+        if elem_id in index:
+            duplicate_ids.append(elem_id)
+            continue
+        index[elem_id] = elem
+    return index, duplicate_ids
+
+
+def iter_mapped_subtitles(sentences, subtitle_index, missing_ids=None, target_lang=None):
+    """
+    Yields the translated subtitle chunks for each sentence, in order.
+
+    Languages with a RedistributionProfile (JA, ZH-HANS) are split by characters in
+    proportion to each cue's duration, wrapped into lines and given enough display
+    time for their reading speed; other languages are split evenly by words.
+
+    Args:
+        sentences (list): Sentence objects from break_into_sentences.
+        subtitle_index (dict): Mapping of subtitle id to translated <subtitle> element.
+        missing_ids (list optional): Collects the reference ids with no translated text.
+        target_lang (TargetLanguage optional): Language the sentences were translated into.
+    Yields:
+        dict: 'text', 'start_time' and 'end_time' for an individual subtitle chunk.
+    """
+    profile = get_redistribution_profile(target_lang)
+    for sentence in sentences:
+        # Use the first subtitle index as reference for matching in the XML.
+        if not sentence.cue_count:
+            continue
+        ref_id = sentence.first_index
+        subtitle_elem = subtitle_index.get(str(ref_id))
+        if subtitle_elem is None or subtitle_elem.text is None:
+            if missing_ids is not None:
+                missing_ids.append(ref_id)
+            continue
+
+        full_translated_text = subtitle_elem.text.strip()
+        num_chunks = sentence.cue_count
+        if profile is not None:
+            yield from _iter_redistributed_chunks(sentence, full_translated_text, profile)
+            continue
+        if num_chunks > 1:
+            chunks = split_text_into_chunks(full_translated_text, num_chunks)
+            # Fallback: if splitting fails unexpectedly.
+            if len(chunks) != num_chunks:
+                chunks = [full_translated_text] * num_chunks
+        else:
+            chunks = [full_translated_text]
+
+        # Map chunks to corresponding subtitle timestamps.
+        timestamps = sentence.timestamps
+        for idx, chunk in enumerate(chunks):
+            # Safely get the corresponding timestamp.
+            if idx < len(timestamps):
+                start_time, end_time = timestamps[idx]
+            else:
+                start_time, end_time = timestamps[0]
+
+            yield {
+                'text': chunk,
+                'start_time': start_time,
+                'end_time': end_time
+            }
+
+
+def _iter_redistributed_chunks(sentence, translated_text, profile):
+    """Yields a sentence's chunks split by cue duration under a RedistributionProfile."""
+    durations = [end - start for start, end in zip(sentence.start_ms, sentence.end_ms)]
+    yield from _iter_timed_chunks(sentence, split_by_duration(translated_text, durations, profile), profile)
+
+
+def _iter_timed_chunks(sentence, chunks, profile):
+    """
+    Yields a sentence's translated chunks with the times of its cues, extended for
+    reading speed under a RedistributionProfile.
+    """
+    if profile is None:
+        for chunk, (start_time, end_time) in zip(chunks, sentence.timestamps):
+            yield {'text': chunk, 'start_time': start_time, 'end_time': end_time}
+        return
+    starts = sentence.start_ms
+    ends = extend_for_reading_speed(chunks, starts, sentence.end_ms, sentence.next_start_ms, profile)
+    for chunk, start, end in zip(chunks, starts, ends):
+        yield {
+            'text': chunk,
+            'start_time': pysrt.SubRipTime.from_ordinal(start),
+            'end_time': pysrt.SubRipTime.from_ordinal(end)
+        }
+
+
+def iter_sentence_chunks(sentences, translated_sentences_xml, target_lang=None, diagnostics=None):
+    """
+    Yields, for each sentence in order, the list of its mapped subtitle chunks
+    (empty when the translation is missing), so callers can splice per sentence.
+
+    Args:
+        sentences (list): Sentence objects from break_into_sentences.
+        translated_sentences_xml (str): The translated XML text.
+        target_lang (TargetLanguage optional): Language the sentences were translated into.
+        diagnostics (dict optional): Filled like map_sentences_back_split's once every sentence was yielded.
+    """
+    subtitle_index, duplicate_ids = index_subtitle_elements(ET.fromstring(translated_sentences_xml))
+    missing_ids = []
+    for sentence in sentences:
+        yield list(iter_mapped_subtitles([sentence], subtitle_index, missing_ids, target_lang))
+    if diagnostics is not None:
+        diagnostics['missing_ids'] = missing_ids
+        diagnostics['duplicate_ids'] = duplicate_ids
+
+
+def map_sentences_back_split(sentences, translated_sentences_xml, diagnostics=None, target_lang=None):
     """
     Maps the translated sentences back to individual subtitle chunks.
     If a sentence spans multiple subtitles (i.e., multiple indices),
     the function splits the translated text into evenly distributed chunks
-    across those subtitles.
+    across those subtitles (by cue duration for JA and ZH-HANS, see iter_mapped_subtitles).
     
     Args:
-        sentences (list): List of dicts with sentence details (including 'indices' and 'timestamps').
+        sentences (list): Sentence objects from break_into_sentences.
         translated_sentences_xml (str): The translated XML text.
+        diagnostics (dict optional): Filled with 'missing_ids' (sentences with no translated
+            text) and 'duplicate_ids' (ids returned more than once by the translator).
+        target_lang (TargetLanguage optional): Language the sentences were translated into.
     
     Returns:
         list: A list of dicts, each with 'text', 'start_time', and 'end_time' for the individual subtitle chunks.
     """
-    # Parse the translated XML
+    # Parse the translated XML and index it once by subtitle id
     root = ET.fromstring(translated_sentences_xml)
-    
-    mapped_results = []
-    for sentence in sentences:
-        # Use the first subtitle index as reference for matching in the XML.
-        if not sentence['indices']:
-            continue
-        ref_id = sentence['indices'][0]
-        subtitle_elem = root.find(f"./subtitle[@id='{ref_id}']")
-        if subtitle_elem is not None and subtitle_elem.text is not None:
-            full_translated_text = subtitle_elem.text.strip()
-            num_chunks = len(sentence['indices'])
-            if num_chunks > 1:
-                chunks = split_text_into_chunks(full_translated_text, num_chunks)
-                # Fallback: if splitting fails unexpectedly.
-                if len(chunks) != num_chunks:
-                    chunks = [full_translated_text] * num_chunks
-            else:
-                chunks = [full_translated_text]
-            
-            # Map chunks to corresponding subtitle timestamps.
-            for idx, chunk in enumerate(chunks):
-                # Safely get the corresponding timestamp.
-                if idx < len(sentence['timestamps']):
-                    start_time, end_time = sentence['timestamps'][idx]
-                else:
-                    start_time, end_time = sentence['timestamps'][0]
-                    
-                mapped_results.append({
-                    'text': chunk,
-                    'start_time': start_time,
-                    'end_time': end_time
-                })
-        else:
-            print(f"Warning: No translated text found for subtitle starting at index {sentence['indices'][0]}")
-            
+    subtitle_index, duplicate_ids = index_subtitle_elements(root)
+
+    missing_ids = []
+    mapped_results = list(iter_mapped_subtitles(sentences, subtitle_index, missing_ids, target_lang))
+
+    if diagnostics is not None:
+        diagnostics['missing_ids'] = missing_ids
+        diagnostics['duplicate_ids'] = duplicate_ids
+
     return mapped_results
 
 
+def record_mapping_diagnostics(metrics, diagnostics, description):
+    """
+    Counts the sentences DeepL returned without text ('sentences_missing') and the
+    ids it returned more than once ('duplicate_ids') on a job's JobMetrics, and
+    logs them, so those sentences are not dropped from the output silently.
+
+    Args:
+        metrics (JobMetrics optional): Receives the counters.
+        diagnostics (dict): As filled by map_sentences_back_split.
+        description (str): What was translated, for the log line.
+    """
+    missing = len(diagnostics.get('missing_ids', ()))
+    duplicate = len(diagnostics.get('duplicate_ids', ()))
+    if missing:
+        incr_all([metrics], "sentences_missing", missing)
+    if duplicate:
+        incr_all([metrics], "duplicate_ids", duplicate)
+    if missing or duplicate:
+        print(f"Translation of {description}: {missing} sentences came back without text, "
+              f"{duplicate} subtitle ids were returned more than once")
+
+
 class SRTTranslationError(Exception):
     """Custom exception for SRT translation errors"""
     pass
 
 
-def check_deepl_quota():
+def check_deepl_quota(backend=None):
     """
-    Checks DeepL API usage and limits.
+    Checks DeepL API usage and limits against the local usage ledger, which is
+    reconciled with DeepL in the background rather than queried for every job.
+
+    Args:
+        backend (TranslatorBackend optional): Source of the authoritative usage, defaults to get_backend().
     
     Raises:
         SRTTranslationError: If API quota is exceeded or close to limit
     """
     try:
-        translator = Translator(os.environ.get("DEEPL_AUTH_KEY"))
-        usage = translator.get_usage()
-        if usage.character.limit_reached:
+        ledger = get_usage_ledger()
+        ledger.start((backend or get_backend()).get_usage)
+        remaining = ledger.remaining()
+        if remaining is not None and remaining <= 0:
             raise SRTTranslationError("DeepL API character limit reached")
         
         # Warning if using more than 90% of quota
-        if usage.character.count / usage.character.limit > 0.9:
-            print(f"Warning: DeepL API usage at {usage.character.count}/{usage.character.limit} characters")
+        if ledger.usage_ratio() > DEEPL_USAGE_WARNING_RATIO:
+            print(f"Warning: DeepL API usage at {ledger.count}/{ledger.limit} characters")
     except Exception as e:
         raise SRTTranslationError(f"Failed to check DeepL API quota: {str(e)}")
 
@@ -280,4 +1012,38 @@ def validate_srt_file(srt_file):
             raise SRTTranslationError(f"SRT file is empty: {srt_file}")
         return subs
     except pysrt.Error as e:
-        raise SRTTranslationError(f"Invalid SRT format: {str(e)}")
\ No newline at end of file
+        raise SRTTranslationError(f"Invalid SRT format: {str(e)}")
+
+
+def iter_srt_cues(srt_file):
+    """
+    Parses an SRT file lazily, yielding one pysrt.SubRipItem at a time so memory
+    stays bounded by the longest cue rather than the file size.
+
+    Args:
+        srt_file (str): Path to the SRT file
+    Raises:
+        SRTTranslationError: If the file is missing or improperly formatted
+    """
+    if not os.path.exists(srt_file):
+        raise SRTTranslationError(f"SRT file not found: {srt_file}")
+
+    try:
+        with open(srt_file, 'r', encoding=_detect_srt_encoding(srt_file)) as source:
+            yield from pysrt.stream(source)
+    except pysrt.Error as e:
+        raise SRTTranslationError(f"Invalid SRT format: {str(e)}")
+
+
+def _detect_srt_encoding(srt_file):
+    """
+    Picks the encoding from a byte order mark like pysrt.open does, defaulting to UTF-8.
+    """
+    with open(srt_file, 'rb') as f:
+        head = f.read(4)
+    for bom, encoding in ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                          (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if head.startswith(bom):
+            return encoding
+    # utf-8-sig also strips a UTF-8 BOM if there is one
+    return 'utf-8-sig'
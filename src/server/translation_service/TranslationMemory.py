@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+TRANSLATION_MEMORY_PATH = os.environ.get("TRANSLATION_MEMORY_PATH", "./translation_memory.db")
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.environ.get("TRANSLATION_MEMORY_MAX_ENTRIES", 500_000))
+TRANSLATION_MEMORY_TTL_SECONDS = int(os.environ.get("TRANSLATION_MEMORY_TTL_SECONDS", 90 * 24 * 3600))
+
+
+def normalize_sentence(text):
+    """
+    Collapses whitespace the same way the sentence is cleaned before it is sent to DeepL,
+    so that identical lines with different line breaks share one cache entry.
+    """
+    return ' '.join(text.split())
+
+
+class TranslationMemory:
+    """
+    Persistent SQLite cache of sentence translations keyed by
+    (normalized sentence, target language, formality).
+
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once the table grows past max_entries.
+    """
+
+    def __init__(self, path=TRANSLATION_MEMORY_PATH, max_entries=TRANSLATION_MEMORY_MAX_ENTRIES,
+                 ttl_seconds=TRANSLATION_MEMORY_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                source_text TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                formality TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (source_text, target_lang, formality)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_translation_memory_last_used_at "
+            "ON translation_memory (last_used_at)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.characters_saved = 0
+
+    def get_many(self, texts, target_lang, formality):
+        """
+        Looks up normalized sentences and refreshes the LRU timestamp of every hit.
+
+        Args:
+            texts (iterable): Normalized sentence texts.
+            target_lang (str): The target language code.
+            formality (str): The DeepL formality setting.
+        Returns:
+            dict: Mapping of source text to cached translation for the hits only.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        now = time.time()
+        oldest_valid = now - self.ttl_seconds
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(unique_texts), 500):
+                batch = unique_texts[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT source_text, translated_text FROM translation_memory "
+                    f"WHERE target_lang = ? AND formality = ? AND created_at >= ? "
+                    f"AND source_text IN ({placeholders})",
+                    (target_lang, formality, oldest_valid, *batch)
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE translation_memory SET last_used_at = ? "
+                    "WHERE source_text = ? AND target_lang = ? AND formality = ?",
+                    [(now, text, target_lang, formality) for text in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_texts) - len(found)
+            self.characters_saved += sum(len(text) for text in found)
+        return found
+
+    def put_many(self, translations, target_lang, formality):
+        """
+        Stores freshly translated sentences and evicts expired and least recently used entries.
+
+        Args:
+            translations (dict): Mapping of normalized source text to translated text.
+            target_lang (str): The target language code.
+            formality (str): The DeepL formality setting.
+        """
+        if not translations:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translation_memory "
+                "(source_text, target_lang, formality, translated_text, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(text, target_lang, formality, translated, now, now)
+                 for text, translated in translations.items()]
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute(
+            "DELETE FROM translation_memory WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM translation_memory WHERE rowid IN ("
+                "SELECT rowid FROM translation_memory ORDER BY last_used_at LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self):
+        """
+        Returns the hit rate and the DeepL characters saved since this process started.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM translation_memory").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "characters_saved": self.characters_saved,
+            }
+
+
+_translation_memory = None
+_translation_memory_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """
+    Returns the process-wide translation memory, opening it on first use.
+    """
+    global _translation_memory
+    if _translation_memory is None:
+        with _translation_memory_lock:
+            if _translation_memory is None:
+                _translation_memory = TranslationMemory()
+    return _translation_memory
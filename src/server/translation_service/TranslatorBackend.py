@@ -0,0 +1,255 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .DeepLClient import get_translator, DEEPL_POOL_SIZE
+from .RequestScheduler import get_request_scheduler
+
+try:
+    import httpx
+except ImportError:  # only needed by AsyncDeepLBackend
+    httpx = None
+
+TRANSLATOR_BACKEND = os.environ.get("TRANSLATOR_BACKEND", "deepl")
+DEEPL_ASYNC_CONCURRENCY = int(os.environ.get("DEEPL_ASYNC_CONCURRENCY", 64))
+
+
+class TranslatorBackend:
+    """
+    Interface between the SRT pipeline and a translation service.
+
+    A backend translates <subtitles> XML documents with tag handling and reports
+    character usage. Subclasses implement translate_document; the default
+    translate_batches runs documents concurrently on a bounded thread pool.
+    """
+
+    def translate_document(self, xml_string, target_lang, formality):
+        """Translates one XML document and returns the translated XML."""
+        raise NotImplementedError
+
+    def translate_batches(self, batches, target_lang, formality, max_workers=1, on_result=None):
+        """
+        Translates several XML documents.
+
+        Args:
+            on_result (callable optional): Called with (batch index, translated document)
+                as soon as each batch succeeds, even if another batch fails.
+        Returns:
+            list: The translated documents, in the order of batches.
+        """
+        results = [None] * len(batches)
+        first_error = None
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures = {
+                executor.submit(self.translate_document, batch, target_lang, formality): index
+                for index, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if on_result is not None:
+                    on_result(futures[future], results[futures[future]])
+        if first_error is not None:
+            raise first_error
+        return results
+
+    def get_usage(self):
+        """
+        Returns:
+            tuple: (characters used, character limit) of the account.
+        """
+        raise NotImplementedError
+
+
+class DeepLBackend(TranslatorBackend):
+    """
+    Synchronous backend on the shared deepl.Translator, one pool thread per request in flight.
+    Requests go through the process-wide RequestScheduler, which rate-limits and retries them.
+    """
+
+    def __init__(self, translator=None, scheduler=None):
+        self._translator = translator
+        self.scheduler = scheduler or get_request_scheduler()
+
+    @property
+    def translator(self):
+        return self._translator or get_translator()
+
+    def translate_document(self, xml_string, target_lang, formality):
+        return self.scheduler.call(lambda: self.translator.translate_text(
+            xml_string,
+            target_lang=target_lang,
+            tag_handling="xml",
+            formality=formality
+        ).text, characters=len(xml_string))
+
+    def get_usage(self):
+        usage = self.scheduler.call(self.translator.get_usage)
+        return usage.character.count, usage.character.limit
+
+
+class AsyncDeepLBackend(TranslatorBackend):
+    """
+    asyncio backend talking to the DeepL REST API through one pooled httpx client.
+
+    Requests are multiplexed over a single HTTP/2 connection when the h2 package
+    is installed (HTTP/1.1 keep-alive pool otherwise), so hundreds of batches can
+    be in flight without a thread each. The event loop runs in its own thread so
+    synchronous callers can use translate_batches; async callers can await
+    translate_batches_async directly on that loop. Requests also pass through the
+    process-wide RequestScheduler, which rate-limits and retries them.
+    """
+
+    def __init__(self, auth_key=None, server_url=None, max_concurrency=DEEPL_ASYNC_CONCURRENCY, scheduler=None):
+        if httpx is None:
+            raise RuntimeError("AsyncDeepLBackend requires the httpx package")
+        self.auth_key = auth_key or os.environ["DEEPL_AUTH_KEY"]
+        # Free-plan keys end in ':fx' and are served from a separate host
+        self.server_url = server_url or (
+            "https://api-free.deepl.com" if self.auth_key.endswith(":fx") else "https://api.deepl.com"
+        )
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler or get_request_scheduler()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="deepl-async", daemon=True)
+        self._thread.start()
+        self._client = None
+        self._semaphore = None
+
+    def _ensure_client(self):
+        # Created lazily so they bind to self.loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.server_url,
+                headers={"Authorization": f"DeepL-Auth-Key {self.auth_key}"},
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=DEEPL_POOL_SIZE, max_keepalive_connections=DEEPL_POOL_SIZE),
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def translate_document_async(self, xml_string, target_lang, formality):
+        client = self._ensure_client()
+
+        async def post():
+            async with self._semaphore:
+                # A JSON body carries the text as raw UTF-8; form encoding would triple
+                # every non-ASCII byte and push JA/ZH/KO batches past DeepL's size limit
+                response = await client.post("/v2/translate", json={
+                    "text": [xml_string],
+                    "target_lang": target_lang,
+                    "tag_handling": "xml",
+                    "formality": formality,
+                })
+            # Raised inside the scheduler so 429s and 5xx are retried
+            response.raise_for_status()
+            return response
+
+        response = await self.scheduler.call_async(post, characters=len(xml_string))
+        return response.json()["translations"][0]["text"]
+
+    async def translate_batches_async(self, batches, target_lang, formality, on_result=None):
+        async def translate_batch(index, batch):
+            translated = await self.translate_document_async(batch, target_lang, formality)
+            if on_result is not None:
+                # Callbacks may block (e.g. a database write); keep them off the loop
+                await asyncio.to_thread(on_result, index, translated)
+            return translated
+
+        # Every batch runs to completion before an error is raised, so none is left
+        # running (and checkpointing) behind a job that already failed
+        results = await asyncio.gather(
+            *(translate_batch(index, batch) for index, batch in enumerate(batches)), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def translate_document(self, xml_string, target_lang, formality):
+        return self._run(self.translate_document_async(xml_string, target_lang, formality))
+
+    def translate_batches(self, batches, target_lang, formality, max_workers=1, on_result=None):
+        # max_workers does not apply: concurrency is bounded by max_concurrency instead
+        return self._run(self.translate_batches_async(batches, target_lang, formality, on_result))
+
+    async def _get_usage_async(self):
+        client = self._ensure_client()
+
+        async def get():
+            response = await client.get("/v2/usage")
+            response.raise_for_status()
+            return response
+
+        usage = (await self.scheduler.call_async(get)).json()
+        return usage["character_count"], usage["character_limit"]
+
+    def get_usage(self):
+        return self._run(self._get_usage_async())
+
+
+class FakeTranslatorBackend(TranslatorBackend):
+    """
+    In-process stand-in for tests and benchmarks. Returns each document unchanged
+    (or passed through translate) after sleeping latency seconds, and records
+    every request it receives.
+    """
+
+    def __init__(self, latency=0.0, translate=None, character_limit=10 ** 9):
+        self.latency = latency
+        self.translate = translate
+        self.character_limit = character_limit
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def translate_document(self, xml_string, target_lang, formality):
+        with self._lock:
+            self.requests.append((xml_string, target_lang, formality))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.translate is not None:
+            return self.translate(xml_string, target_lang)
+        return xml_string
+
+    def get_usage(self):
+        with self._lock:
+            return sum(len(request[0]) for request in self.requests), self.character_limit
+
+
+_BACKEND_FACTORIES = {
+    "deepl": DeepLBackend,
+    "deepl-async": AsyncDeepLBackend,
+    "fake": FakeTranslatorBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend selected by TRANSLATOR_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if TRANSLATOR_BACKEND not in _BACKEND_FACTORIES:
+                    raise ValueError(f"Unknown TRANSLATOR_BACKEND: {TRANSLATOR_BACKEND}")
+                _backend = _BACKEND_FACTORIES[TRANSLATOR_BACKEND]()
+    return _backend
+
+
+def set_backend(backend):
+    """Replaces the process-wide backend, e.g. with a FakeTranslatorBackend in tests."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,110 @@
+import os
+import random
+
+import pysrt
+import pytest
+
+from ..SRTTranslate import break_into_sentences, iter_srt_cues
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def baseline_break_into_sentences(subs):
+    """The segmentation algorithm break_into_sentences must reproduce, kept as it was before it was optimized."""
+    abbreviations = {
+        'etc.', 'e.g.', 'i.e.', 'vs.', 'Mr.', 'Mrs.', 'Ms.', 'Dr.', 'Prof.',
+        'Sr.', 'Jr.', 'Co.', 'Ltd.', 'Inc.', 'St.', 'Ave.', 'Ph.D.', 'U.S.',
+        'U.K.', 'a.m.', 'p.m.', 'vol.', 'rev.', 'no.', 'p.', 'pp.'
+    }
+    sentence_ends = ('.', '!', '?', '...', '…')
+
+    sentences = []
+    current_sentence = {'text': '', 'indices': [], 'timestamps': []}
+    for sub in subs:
+        text = sub.text.strip()
+        if not text:
+            continue
+        current_sentence['indices'].append(sub.index)
+        current_sentence['timestamps'].append((sub.start, sub.end))
+        if text.startswith(('...', '…')) and current_sentence['text']:
+            current_sentence['text'] = current_sentence['text'].rstrip() + '...'
+        current_sentence['text'] += ' ' + text
+
+        is_abbreviation = any(text.endswith(abbr) for abbr in abbreviations)
+        ends_with_sentence = any(text.endswith(end) for end in sentence_ends)
+        if ends_with_sentence and not is_abbreviation:
+            if text.count('"') % 2 == 0:
+                current_sentence['text'] = current_sentence['text'].strip()
+                sentences.append(current_sentence)
+                current_sentence = {'text': '', 'indices': [], 'timestamps': []}
+
+    if current_sentence['text']:
+        current_sentence['text'] = current_sentence['text'].strip()
+        sentences.append(current_sentence)
+    return sentences
+
+
+def _as_tuples(sentences):
+    """(text, indices, [(start ms, end ms)]) of each sentence, for Sentence objects and baseline dicts alike."""
+    return [
+        (sentence['text'], list(sentence['indices']),
+         [(start.ordinal, end.ordinal) for start, end in sentence['timestamps']])
+        for sentence in sentences
+    ]
+
+
+def _assert_same_segmentation(cues):
+    expected = _as_tuples(baseline_break_into_sentences(cues))
+    actual = _as_tuples(break_into_sentences(cues))
+    assert actual == expected
+
+
+def _cue(index, position, text):
+    return pysrt.SubRipItem(index=index, start=position * 1000, end=position * 1000 + 900, text=text)
+
+
+def test_fixture_file_matches_baseline():
+    cues = list(iter_srt_cues(os.path.join(FIXTURES_DIR, "segmentation.srt")))
+    _assert_same_segmentation(cues)
+
+
+def test_trailing_fragment_is_its_own_sentence():
+    cues = [_cue(1, 0, "A full sentence."), _cue(2, 1, "and a fragment"), _cue(3, 2, "without an end")]
+    _assert_same_segmentation(cues)
+    sentences = break_into_sentences(cues)
+    assert [sentence.text for sentence in sentences] == ["A full sentence.", "and a fragment without an end"]
+    assert list(sentences[-1].indices) == [2, 3]
+
+
+@pytest.mark.parametrize("indices", [
+    [None, None, None, None],
+    ["a", "b", "c", "d"],
+    [1, "x2", 3, None],
+    [10, 3, 7, 2],
+])
+def test_non_integer_and_unordered_indices(indices):
+    texts = ["Hello there,", "Mr. Brown.", "...and you?", "Not finished"]
+    cues = [_cue(index, position, text) for position, (index, text) in enumerate(zip(indices, texts))]
+    _assert_same_segmentation(cues)
+
+
+def test_empty_input():
+    assert break_into_sentences([]) == []
+    _assert_same_segmentation([_cue(1, 0, "   "), _cue(2, 1, "")])
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_corpus_matches_baseline(seed):
+    words = ('etc. e.g. i.e. vs. Mr. Mrs. stop. piano. no. p. pp. Ph.D. U.S. ... … hi! why? '
+             '"quote "done." a b c ! ? .').split()
+    rng = random.Random(seed)
+    cues = []
+    for position in range(200):
+        text = ' '.join(rng.choices(words, k=rng.randint(0, 5)))
+        if rng.random() < 0.1:
+            text = '...' + text
+        if rng.random() < 0.1:
+            text = '  ' + text + ' \n'
+        index = position + 1 if rng.random() > 0.05 else rng.choice([None, f"x{position}"])
+        cues.append(_cue(index, position, text))
+    _assert_same_segmentation(cues)
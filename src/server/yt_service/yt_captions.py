@@ -1,9 +1,14 @@
+import json
 import os
+import queue
+import threading
 from typing import Optional, List
 from fastapi import HTTPException, Depends, UploadFile, File, Header, Body
 
+import httplib2
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
 from googleapiclient.http import MediaFileUpload
@@ -11,6 +16,74 @@ from googleapiclient.http import MediaFileUpload
 from ..file_service.main import app
 from .model import CaptionInsertRequest, CaptionResponse, CaptionUpdateRequest
 
+# Optional on-disk copy of the YouTube v3 discovery document. Read instead of the one
+# bundled with google-api-python-client, and written once if neither exists.
+YOUTUBE_DISCOVERY_PATH = os.environ.get("YOUTUBE_DISCOVERY_PATH")
+YOUTUBE_DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+YOUTUBE_HTTP_TIMEOUT_SECONDS = float(os.environ.get("YOUTUBE_HTTP_TIMEOUT_SECONDS", 60))
+# Idle keep-alive transports kept for reuse; more are opened under bursts and dropped afterwards
+YOUTUBE_HTTP_POOL_SIZE = int(os.environ.get("YOUTUBE_HTTP_POOL_SIZE", 16))
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+# httplib2.Http is not thread-safe, so a request checks one out for its whole lifetime
+_idle_http = queue.LifoQueue(maxsize=YOUTUBE_HTTP_POOL_SIZE)
+
+
+def get_discovery_document():
+    """
+    Returns the parsed YouTube v3 discovery document, loaded once per process
+    from YOUTUBE_DISCOVERY_PATH, else the copy bundled with the client library,
+    else the discovery service.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                _discovery_document = json.loads(_read_discovery_document())
+    return _discovery_document
+
+
+def _read_discovery_document():
+    if YOUTUBE_DISCOVERY_PATH and os.path.exists(YOUTUBE_DISCOVERY_PATH):
+        with open(YOUTUBE_DISCOVERY_PATH, encoding="utf-8") as f:
+            return f.read()
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        document = get_static_doc("youtube", "v3")
+    except ImportError:  # google-api-python-client < 2.0 has no bundled documents
+        document = None
+    if document is None:
+        http = _checkout_http()
+        try:
+            response, content = http.request(YOUTUBE_DISCOVERY_URL)
+        finally:
+            _return_http(http)
+        if response.status >= 400:
+            raise RuntimeError(f"Failed to fetch the YouTube discovery document: HTTP {response.status}")
+        document = content.decode("utf-8")
+        if YOUTUBE_DISCOVERY_PATH:
+            with open(YOUTUBE_DISCOVERY_PATH + ".tmp", "w", encoding="utf-8") as f:
+                f.write(document)
+            os.replace(YOUTUBE_DISCOVERY_PATH + ".tmp", YOUTUBE_DISCOVERY_PATH)
+    return document
+
+
+def _checkout_http():
+    """Takes an idle HTTP transport out of the pool, or opens a new one. Hand it back with _return_http."""
+    try:
+        return _idle_http.get_nowait()
+    except queue.Empty:
+        return httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT_SECONDS)
+
+
+def _return_http(http):
+    try:
+        _idle_http.put_nowait(http)
+    except queue.Full:
+        http.close()
+
+
 # Helper function to get authenticated YouTube service
 def get_authenticated_service(authorization: Optional[str] = Header(None)):
     """ TODO: handle token refresh
@@ -20,8 +93,9 @@ def get_authenticated_service(authorization: Optional[str] = Header(None)):
     Args:
         authorization: The Authorization header containing the access token in the format "Bearer {token}"
         
-    Returns:
-        An authenticated YouTube API service
+    Yields:
+        An authenticated YouTube API service, with an HTTP transport of its own
+        until the request is done
         
     Raises:
         HTTPException: If no valid authorization header is provided
@@ -42,16 +116,26 @@ def get_authenticated_service(authorization: Optional[str] = Header(None)):
     
     token = authorization.replace("Bearer ", "")
 
+    http = _checkout_http()
     try:
-        credentials = Credentials(token=token)
+        try:
+            credentials = Credentials(token=token)
 
-        youtube = build(serviceName="youtube", version="v3", credentials=credentials)
-        return youtube
-    except Exception as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Authentication failed: {str(e)}"
-        )
+            # Only the credentials are per request: the discovery document is parsed once
+            # and the connections are reused across requests
+            youtube = build_from_document(
+                get_discovery_document(),
+                http=AuthorizedHttp(credentials, http=http)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=401,
+                detail=f"Authentication failed: {str(e)}"
+            )
+        yield youtube
+    finally:
+        # The endpoint, on whichever thread it ran, is done with the transport
+        _return_http(http)
 
 
 